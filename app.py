@@ -13,14 +13,18 @@ import os
 import json
 
 from encryption.key_generation import generate_keys
+from encryption.keystore import ensure_recipient_keys, get_default_keystore
 from encryption.encrypt_audio import encrypt_audio
-from encryption.decrypt_audio import decrypt_audio
+from encryption.decrypt_audio import decrypt_envelope
 from steganography.embed_audio import embed_data_into_image
 from steganography.extract_audio import extract_data_from_image
+from steganography.compression import CODECS, compress_payload, decompress_payload, reduce_wav
 from utils.metrics import calculate_psnr, calculate_mse, calculate_embedding_capacity
-from utils.audio_processing import get_audio_features
+from utils.audio_processing import get_audio_features, AudioFeatures, FEATURE_TIERS
 from utils.visualization import create_waveform_plot, create_spectrogram_plot, create_mel_spectrogram, create_chroma_plot, create_spectral_features_plot
 from utils.audio_processing import get_audio_statistics
+from utils.audio_analysis import AudioAnalysis
+from utils.result_cache import content_key, get_analysis_cache, get_default_cache
 
 # Page configuration
 st.set_page_config(
@@ -108,27 +112,50 @@ def add_watermark(fig):
     )
     return fig
 
-def create_visualization(y, sr, plot_type):
+def create_visualization(y, sr, plot_type, analysis=None):
     if plot_type == "waveform":
         fig = create_waveform_plot(y, sr)
     elif plot_type == "spectrogram":
-        fig = create_spectrogram_plot(y, sr)
+        fig = create_spectrogram_plot(y, sr, analysis)
     elif plot_type == "mel":
-        fig = create_mel_spectrogram(y, sr)
+        fig = create_mel_spectrogram(y, sr, analysis)
     elif plot_type == "chroma":
-        fig = create_chroma_plot(y, sr)
+        fig = create_chroma_plot(y, sr, analysis)
     elif plot_type == "spectral":
-        fig = create_spectral_features_plot(y, sr)
+        fig = create_spectral_features_plot(y, sr, analysis)
     
     return add_watermark(fig)
 
+def load_analysis(audio_bytes):
+    """Decode audio bytes and wrap them in an AudioAnalysis, reusing earlier results for the same content"""
+    cache = get_default_cache()
+    y, sr = cache.get_or_compute(content_key('audio', audio_bytes), lambda: librosa.load(io.BytesIO(audio_bytes)))
+    # The analysis holds full spectra, so only the latest few are kept, in memory
+    return get_analysis_cache().get_or_compute(content_key('analysis', audio_bytes), lambda: AudioAnalysis(y, sr),
+                                               persist=False)
+
+def cached_figure(audio_bytes, plot_type, variant, build):
+    """
+    Build a figure once per audio content, plot type and variant. The variant
+    names the builder (e.g. watermarked or plain), since the same audio can be
+    plotted by both pages.
+    """
+    return get_default_cache().get_or_compute(content_key('figure', audio_bytes, plot_type, variant), build)
+
 def main():
     st.title("🎵 StegoCrypt Audio")
     st.markdown("### Advanced Audio Steganography with Hybrid Encryption")
 
+    # Start pre-generating key pairs while the user uploads files
+    keystore = get_default_keystore()
+
     # Sidebar
     st.sidebar.title("Navigation")
     mode = st.sidebar.radio("Select Mode", ["Embedding", "Extraction"])
+    with st.sidebar.expander("Key Pool"):
+        st.json(keystore.stats())
+    with st.sidebar.expander("Result Cache"):
+        st.json({'results': get_default_cache().stats(), 'analyses': get_analysis_cache().stats()})
 
     if mode == "Embedding":
         embedding_process()
@@ -154,7 +181,8 @@ def embedding_process():
     # Process embedding
     if embed_type == "Audio in Image" and audio_file and carrier_image:
         # Read files
-        audio_bytes = audio_file.read()
+        audio_bytes = audio_file.getvalue()
+        image_bytes = carrier_image.getvalue()
         image = Image.open(carrier_image)
 
         # Display original files
@@ -162,17 +190,15 @@ def embedding_process():
         
         with col1:
             st.subheader("Original Audio Analysis")
-            y, sr = librosa.load(io.BytesIO(audio_bytes))
+            analysis = load_analysis(audio_bytes)
+            y, sr = analysis.y, analysis.sr
             
             # Update visualization calls to include watermark
-            waveform_plot = create_visualization(y, sr, "waveform")
-            st.plotly_chart(waveform_plot, use_container_width=True)
-    
-            spectrogram_plot = create_visualization(y, sr, "spectrogram")
-            st.plotly_chart(spectrogram_plot, use_container_width=True)
-    
-            mel_plot = create_visualization(y, sr, "mel")
-            st.plotly_chart(mel_plot, use_container_width=True)
+            for plot_type in ("waveform", "spectrogram", "mel"):
+                # The watermark carries the year, so figures are rebuilt when it changes
+                plot = cached_figure(audio_bytes, plot_type, ('watermarked', datetime.now().year),
+                                     lambda: create_visualization(y, sr, plot_type, analysis))
+                st.plotly_chart(plot, use_container_width=True)
 
 
         with col2:
@@ -180,28 +206,50 @@ def embedding_process():
             st.image(image, use_column_width=True)
             
             # Image histograms
-            fig = px.histogram(np.array(image).ravel(), 
-                             title="Image Pixel Distribution",
-                             labels={'value': 'Pixel Value', 'count': 'Frequency'})
+            fig = get_default_cache().get_or_compute(
+                content_key('histogram', image_bytes),
+                lambda: px.histogram(np.array(image).ravel(),
+                                     title="Image Pixel Distribution",
+                                     labels={'value': 'Pixel Value', 'count': 'Frequency'}))
             st.plotly_chart(fig, use_container_width=True)
 
+        fresh_keys = st.checkbox("Generate a new key pair", value=False,
+                                 help="Leave unchecked to keep encrypting for the current recipient key")
+        codec = st.selectbox("Compression", ['auto'] + list(CODECS),
+                             help="Applied before encryption; auto samples the audio and picks a codec")
+        downmix = st.checkbox("Downmix to mono (lossy)", value=False)
+
         if st.button("Embed Audio in Image"):
             with st.spinner("Processing..."):
-                # Generate keys
-                generate_keys()
+                # Reuse the recipient key pair unless a new one is requested
+                if fresh_keys:
+                    generate_keys()
+                else:
+                    ensure_recipient_keys()
                 
-                # Encrypt and embed
-                encrypted_aes_key, nonce, tag, ciphertext = encrypt_audio(audio_bytes)
+                # Compress, encrypt and embed
+                payload_audio = audio_bytes
+                if downmix:
+                    try:
+                        payload_audio = reduce_wav(audio_bytes, channels=1)
+                    except ValueError as e:
+                        st.error(f"Cannot downmix this audio file: {e}")
+                        st.stop()
+                envelope = encrypt_audio(compress_payload(payload_audio, codec))
                 output_path = "stego_image.png"
-                embed_data_into_image(carrier_image,
-                                      (encrypted_aes_key, nonce, tag, ciphertext),
-                                      output_path)
+                embed_data_into_image(carrier_image, envelope, output_path)
 
                 # Calculate metrics
-                stego_image = Image.open(output_path)
-                psnr = calculate_psnr(np.array(image), np.array(stego_image))
-                mse = calculate_mse(np.array(image), np.array(stego_image))
-                capacity = calculate_embedding_capacity(np.array(image))
+                with open(output_path, "rb") as f:
+                    stego_bytes = f.read()
+
+                # Every embed yields a new stego image (fresh key and nonce), so only
+                # the capacity, which depends on the cover alone, is worth caching
+                original = np.array(image)
+                stego = np.array(Image.open(io.BytesIO(stego_bytes)))
+                psnr, mse = calculate_psnr(original, stego), calculate_mse(original, stego)
+                capacity = get_default_cache().get_or_compute(
+                    content_key('capacity', image_bytes), lambda: calculate_embedding_capacity(original))
 
                 # Display results
                 st.success("Audio embedded into image successfully!")
@@ -246,21 +294,22 @@ def embedding_process():
                             mime="application/x-pem-file"
                         )
 
-def show_detailed_analysis(y, sr):
+def show_detailed_analysis(y, sr, analysis=None):
     """Show detailed audio analysis"""
+    analysis = analysis or AudioAnalysis(y, sr)
     
     st.subheader("Advanced Audio Analysis")
     
     tabs = st.tabs(["Spectral", "Energy", "Pitch", "Compare"])
     
     with tabs[0]:
-        st.plotly_chart(create_spectral_features_plot(y, sr), use_container_width=True)
+        st.plotly_chart(create_spectral_features_plot(y, sr, analysis), use_container_width=True)
         
     with tabs[1]:
         st.write("Energy contour plot is not available.")
         
     with tabs[2]:
-        st.plotly_chart(create_chroma_plot(y, sr), use_container_width=True)
+        st.plotly_chart(create_chroma_plot(y, sr, analysis), use_container_width=True)
         
     with tabs[3]:
         if 'original_audio' in st.session_state:
@@ -297,6 +346,10 @@ def extraction_process():
         with open("private.pem", "wb") as f:
             f.write(private_key.getvalue())
 
+        include_rhythm = st.checkbox("Include rhythm and tonal features (tempo, MFCC, chroma)", value=False,
+                                     help="Beat tracking is slow on long clips")
+        feature_tiers = FEATURE_TIERS if include_rhythm else ('basic', 'spectral')
+
         if st.button("Extract Audio"):
             with st.spinner("Extracting audio..."):
                 # Extract and decrypt based on type
@@ -308,15 +361,16 @@ def extraction_process():
                 else:
                     from steganography.extract_audio_from_video import extract_data_from_video
                     extracted_data = extract_data_from_video(fname)
-                decrypted_audio = decrypt_audio(*extracted_data)
+                decrypted_audio = decompress_payload(decrypt_envelope(extracted_data))
                 
                 # Save decrypted audio
                 output_path = "decrypted_audio.wav"
                 with open(output_path, "wb") as f:
                     f.write(decrypted_audio)
 
-                # Audio analysis
-                y, sr = librosa.load(output_path)
+                # Audio analysis; one STFT shared by the plots and the features below
+                analysis = load_analysis(decrypted_audio)
+                y, sr = analysis.y, analysis.sr
                 
                 st.success("Audio successfully extracted!")
                 
@@ -328,17 +382,26 @@ def extraction_process():
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.plotly_chart(create_waveform_plot(y, sr), use_container_width=True)
+                    st.plotly_chart(cached_figure(decrypted_audio, "waveform", "plain",
+                                                  lambda: create_waveform_plot(y, sr)),
+                                    use_container_width=True)
                 with col2:
-                    st.plotly_chart(create_spectrogram_plot(y, sr), use_container_width=True)
+                    st.plotly_chart(cached_figure(decrypted_audio, "spectrogram", "plain",
+                                                  lambda: create_spectrogram_plot(y, sr, analysis)),
+                                    use_container_width=True)
                 
-                # Additional features
-                features = get_audio_features(y, sr)
+                # Additional features, shown tier by tier as each finishes
                 st.subheader("Audio Features")
-                
-                # Create a DataFrame for features
-                df = pd.DataFrame(features.items(), columns=['Feature', 'Value'])
-                st.table(df)
+                features = get_analysis_cache().get_or_compute(
+                    content_key('features', decrypted_audio, feature_tiers),
+                    lambda: AudioFeatures(y, sr, analysis, feature_tiers), persist=False)
+                feature_table = st.empty()
+                feature_timings = st.empty()
+                for tier in features.tiers:
+                    features.tier(tier)
+                    df = pd.DataFrame(features.computed().items(), columns=['Feature', 'Value'])
+                    feature_table.table(df)
+                    feature_timings.caption(" | ".join(f"{name}: {seconds:.2f} s" for name, seconds in features.timings.items()))
                 
                 # Download extracted audio
                 with open(output_path, "rb") as file:
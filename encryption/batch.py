@@ -0,0 +1,79 @@
+import struct
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from Crypto.Random import get_random_bytes
+from encryption.keys import load_private_key, load_public_key, unwrap_key, wrap_key
+from encryption.suites import DEFAULT_SUITE, SUITES, get_suite, new_cipher, suite_field, suite_from_field
+
+# Batch envelopes for many payloads sent to one recipient. A single random
+# master key is RSA-wrapped once per batch; each item is encrypted under its
+# own key derived from the master key with HKDF-SHA256, so the RSA cost is
+# paid once per batch on both sides instead of once per item.
+#
+# Envelope fields: (suite, wrapped master key, item id, nonce, tag, ciphertext),
+# where item id is the 16-byte batch salt followed by the 4-byte item index.
+# Envelopes from before cipher suites lack the suite field and use AES-EAX.
+# Every envelope carries the wrapped master key, so items can also be
+# decrypted on their own with decrypt_batch_envelope.
+
+BATCH_ENVELOPE_FIELDS = 6
+_LEGACY_BATCH_ENVELOPE_FIELDS = 5
+
+_SALT_SIZE = 16
+_INDEX = struct.Struct('>I')
+_INFO = b'SonicStegnoVault batch item'
+
+def _item_key(master_key, item_id, suite):
+    return HKDF(master_key, suite.key_size, item_id[:_SALT_SIZE], SHA256, context=_INFO + item_id[_SALT_SIZE:])
+
+def encrypt_batch(payloads, public_key_path='public.pem', suite=DEFAULT_SUITE):
+    """
+    Encrypt a list or iterator of payloads for one recipient, yielding one
+    envelope tuple per item in order.
+    """
+    cipher_suite = get_suite(suite)
+    master_key = get_random_bytes(32)
+    salt = get_random_bytes(_SALT_SIZE)
+    wrapped_master_key = wrap_key(master_key, load_public_key(public_key_path))
+
+    for index, payload in enumerate(payloads):
+        item_id = salt + _INDEX.pack(index)
+        cipher = new_cipher(cipher_suite, _item_key(master_key, item_id, cipher_suite))
+        cipher.update(item_id)
+        ciphertext, tag = cipher.encrypt_and_digest(payload)
+        yield suite_field(suite), wrapped_master_key, item_id, cipher.nonce, tag, ciphertext
+
+def _decrypt_item(master_key, suite, item_id, nonce, tag, ciphertext):
+    item_id = bytes(item_id)
+    if len(item_id) != _SALT_SIZE + _INDEX.size:
+        raise ValueError("Invalid batch item id")
+    cipher = new_cipher(suite, _item_key(master_key, item_id, suite), nonce=bytes(nonce))
+    cipher.update(item_id)
+    return cipher.decrypt_and_verify(ciphertext, tag)
+
+def decrypt_batch(envelopes, private_key_path='private.pem'):
+    """
+    Decrypt batch envelopes in order, yielding plaintexts. Each distinct
+    wrapped master key is RSA-unwrapped only once, so a whole batch costs a
+    single private-key operation.
+    """
+    private_key = load_private_key(private_key_path)
+    master_keys = {}
+    for envelope in envelopes:
+        if len(envelope) == BATCH_ENVELOPE_FIELDS:
+            suite = suite_from_field(envelope[0])
+            wrapped_master_key, item_id, nonce, tag, ciphertext = envelope[1:]
+        elif len(envelope) == _LEGACY_BATCH_ENVELOPE_FIELDS:
+            suite = SUITES['eax']
+            wrapped_master_key, item_id, nonce, tag, ciphertext = envelope
+        else:
+            raise ValueError("Not a batch envelope")
+        wrapped_master_key = bytes(wrapped_master_key)
+        master_key = master_keys.get(wrapped_master_key)
+        if master_key is None:
+            master_key = master_keys[wrapped_master_key] = unwrap_key(wrapped_master_key, private_key)
+        yield _decrypt_item(master_key, suite, item_id, nonce, tag, ciphertext)
+
+def decrypt_batch_envelope(envelope, private_key_path='private.pem'):
+    """Decrypt a single batch envelope"""
+    return next(decrypt_batch([envelope], private_key_path))
@@ -1,12 +1,24 @@
-import rsa
-from Crypto.Cipher import AES
+from encryption.keys import load_private_key, unwrap_key
+from encryption.suites import new_cipher, suite_from_field
 
-def decrypt_audio(encrypted_aes_key, nonce, tag, ciphertext):
-    with open('private.pem', 'rb') as priv_file:
-        private_key = rsa.PrivateKey.load_pkcs1(priv_file.read())
-    aes_key = rsa.decrypt(encrypted_aes_key, private_key)
+def decrypt_audio(encrypted_aes_key, nonce, tag, ciphertext, private_key_path='private.pem', suite='eax'):
+    aes_key = unwrap_key(encrypted_aes_key, load_private_key(private_key_path))
 
-    # Decrypt audio data with AES
-    cipher = AES.new(aes_key, AES.MODE_EAX, nonce=nonce)
+    # Decrypt audio data with the symmetric suite
+    cipher = new_cipher(suite, aes_key, nonce=bytes(nonce))
     audio_data = cipher.decrypt_and_verify(ciphertext, tag)
-    return audio_data
\ No newline at end of file
+    return audio_data
+
+def decrypt_envelope(envelope, private_key_path='private.pem'):
+    """
+    Decrypt an extracted envelope tuple, whether from encrypt_audio or
+    encrypt_batch. Envelopes that start with a one-byte suite field name their
+    cipher suite; older ones without it are AES-EAX.
+    """
+    from encryption.batch import decrypt_batch_envelope
+    if len(envelope) == 4:
+        return decrypt_audio(*envelope, private_key_path=private_key_path)
+    if len(envelope) == 5 and len(envelope[0]) == 1:
+        suite = suite_from_field(envelope[0])
+        return decrypt_audio(*envelope[1:], private_key_path=private_key_path, suite=suite)
+    return decrypt_batch_envelope(envelope, private_key_path)
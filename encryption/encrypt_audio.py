@@ -1,18 +1,21 @@
-import rsa
-from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
+from encryption.keys import load_public_key, wrap_key
+from encryption.suites import DEFAULT_SUITE, get_suite, new_cipher, suite_field
 
-def encrypt_audio(audio_data):
-    # Generate a random AES key
-    aes_key = get_random_bytes(16)  # 128-bit key
+def encrypt_audio(audio_data, public_key_path='public.pem', suite=DEFAULT_SUITE):
+    """
+    Encrypt audio data for the recipient's public key. Returns the envelope
+    (suite, encrypted_aes_key, nonce, tag, ciphertext).
+    """
+    # Generate a random key for the chosen suite
+    cipher_suite = get_suite(suite)
+    aes_key = get_random_bytes(cipher_suite.key_size)
 
-    # Encrypt audio data with AES
-    cipher = AES.new(aes_key, AES.MODE_EAX)
+    # Encrypt audio data with the symmetric suite
+    cipher = new_cipher(cipher_suite, aes_key)
     ciphertext, tag = cipher.encrypt_and_digest(audio_data)
 
-    # Encrypt AES key with RSA
-    with open('public.pem', 'rb') as pub_file:
-        public_key = rsa.PublicKey.load_pkcs1(pub_file.read())
-    encrypted_aes_key = rsa.encrypt(aes_key, public_key)
+    # Encrypt the symmetric key with RSA-OAEP
+    encrypted_aes_key = wrap_key(aes_key, load_public_key(public_key_path))
 
-    return encrypted_aes_key, cipher.nonce, tag, ciphertext
\ No newline at end of file
+    return suite_field(suite), encrypted_aes_key, cipher.nonce, tag, ciphertext
@@ -1,8 +1,5 @@
-import rsa
+from encryption.keystore import get_default_keystore, write_keypair
 
 def generate_keys():
-    (public_key, private_key) = rsa.newkeys(2048)
-    with open('public.pem', 'wb') as pub_file:
-        pub_file.write(public_key.save_pkcs1('PEM'))
-    with open('private.pem', 'wb') as priv_file:
-        priv_file.write(private_key.save_pkcs1('PEM'))
\ No newline at end of file
+    """Write a fresh RSA-2048 key pair to public.pem/private.pem, taken from the key pool"""
+    write_keypair(get_default_keystore().get_keypair())
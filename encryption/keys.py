@@ -0,0 +1,54 @@
+import os
+from functools import lru_cache
+from Crypto.Cipher import PKCS1_OAEP, PKCS1_v1_5
+from Crypto.PublicKey import RSA
+from Crypto.Random import get_random_bytes
+
+# Parsed RSA keys are cached by path, modification time and size, so a key file
+# that is rewritten (e.g. a new private.pem uploaded in the app) is re-read
+# while repeated encrypt/decrypt calls reuse the parsed key.
+_KEY_CACHE_SIZE = 32
+
+def _key_file_id(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+@lru_cache(maxsize=_KEY_CACHE_SIZE)
+def _load_key(path, mtime_ns, size):
+    with open(path, 'rb') as key_file:
+        return RSA.import_key(key_file.read())
+
+def load_public_key(path='public.pem'):
+    """Load a PEM public key (PKCS#1 or SubjectPublicKeyInfo), parsing each file version once"""
+    key = _load_key(*_key_file_id(path))
+    return key.public_key() if key.has_private() else key
+
+def load_private_key(path='private.pem'):
+    """Load a PEM private key, parsing each file version once"""
+    key = _load_key(*_key_file_id(path))
+    if not key.has_private():
+        raise ValueError(f"{path} does not contain a private key")
+    return key
+
+def clear_key_cache():
+    _load_key.cache_clear()
+
+def wrap_key(aes_key, public_key):
+    """Encrypt a symmetric key for the recipient with RSA-OAEP"""
+    return PKCS1_OAEP.new(public_key).encrypt(aes_key)
+
+def unwrap_key(encrypted_aes_key, private_key):
+    """
+    Recover a symmetric key wrapped by wrap_key. Keys wrapped by the older
+    rsa.encrypt (PKCS#1 v1.5 padding) are still accepted.
+    """
+    encrypted_aes_key = bytes(encrypted_aes_key)
+    try:
+        return PKCS1_OAEP.new(private_key).decrypt(encrypted_aes_key)
+    except ValueError:
+        pass
+    sentinel = get_random_bytes(16)
+    aes_key = PKCS1_v1_5.new(private_key).decrypt(encrypted_aes_key, sentinel)
+    if aes_key is sentinel:
+        raise ValueError("Decryption failed: the private key does not match this payload")
+    return aes_key
@@ -0,0 +1,126 @@
+import os
+import queue
+import threading
+import time
+from Crypto.IO import PEM
+from Crypto.PublicKey import RSA
+from Crypto.Util.asn1 import DerSequence
+from encryption.keys import load_private_key, load_public_key
+
+# RSA key generation takes from a fraction of a second to several seconds, so
+# key pairs are generated ahead of time on a background thread and handed out
+# from a bounded pool. Callers that encrypt for the same recipient repeatedly
+# should reuse a long-lived key pair through ensure_recipient_keys instead.
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_KEY_SIZE = 2048
+
+class KeyStore:
+    """Pool of pre-generated RSA key pairs with a background refill thread"""
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, key_size=DEFAULT_KEY_SIZE, refill=True):
+        self.key_size = key_size
+        self._pool = queue.Queue(maxsize=max(pool_size, 1))
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._generation_seconds = 0.0
+        self._thread = None
+        if refill:
+            self._thread = threading.Thread(target=self._refill, name='keystore-refill', daemon=True)
+            self._thread.start()
+
+    def _generate(self):
+        started = time.perf_counter()
+        key = RSA.generate(self.key_size)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._generated += 1
+            self._generation_seconds += elapsed
+        return key
+
+    def _refill(self):
+        while not self._stopped.is_set():
+            key = self._generate()
+            # Block until a slot frees up, waking periodically to notice close()
+            while not self._stopped.is_set():
+                try:
+                    self._pool.put(key, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    def get_keypair(self):
+        """Return an RSA private key (with its public half), from the pool when one is ready"""
+        try:
+            key = self._pool.get_nowait()
+            hit = True
+        except queue.Empty:
+            key = self._generate()
+            hit = False
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+        return key
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pool_size': self._pool.qsize(),
+                'hits': self._hits,
+                'misses': self._misses,
+                'generated': self._generated,
+                'mean_generation_s': self._generation_seconds / self._generated if self._generated else 0.0,
+            }
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+_default_keystore = None
+_default_lock = threading.Lock()
+
+def get_default_keystore(pool_size=DEFAULT_POOL_SIZE, key_size=DEFAULT_KEY_SIZE):
+    """Return the process-wide keystore, starting it on first use"""
+    global _default_keystore
+    with _default_lock:
+        if _default_keystore is None:
+            _default_keystore = KeyStore(pool_size, key_size)
+        return _default_keystore
+
+def export_public_pkcs1(key):
+    """
+    PEM-encode the public half of key as PKCS#1 ("BEGIN RSA PUBLIC KEY"), the
+    format the rsa package wrote, so existing readers of public.pem keep working
+    """
+    der = DerSequence([key.n, key.e]).encode()
+    return PEM.encode(der, 'RSA PUBLIC KEY').encode()
+
+def write_keypair(key, public_path='public.pem', private_path='private.pem'):
+    """Save a key pair as PKCS#1 PEM files"""
+    with open(public_path, 'wb') as pub_file:
+        pub_file.write(export_public_pkcs1(key))
+    with open(private_path, 'wb') as priv_file:
+        priv_file.write(key.export_key('PEM', pkcs=1))
+
+def _keys_match(public_path, private_path):
+    try:
+        return load_public_key(public_path).n == load_private_key(private_path).n
+    except (OSError, ValueError, IndexError, TypeError):
+        return False
+
+def ensure_recipient_keys(public_path='public.pem', private_path='private.pem', keystore=None):
+    """
+    Reuse the key pair on disk if both files exist and belong together;
+    otherwise write a fresh pair from the keystore. Returns True when new
+    keys were written.
+    """
+    if os.path.exists(public_path) and os.path.exists(private_path) and _keys_match(public_path, private_path):
+        return False
+    write_keypair((keystore or get_default_keystore()).get_keypair(), public_path, private_path)
+    return True
@@ -0,0 +1,215 @@
+import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from encryption.keys import load_private_key, load_public_key, unwrap_key, wrap_key
+
+# Chunked AEAD format for payloads that should never be held in memory at once,
+# following the STREAM construction used by age:
+#
+#   header:   magic (4) | version (1) | segment size (4) | wrapped key length (2)
+#             | RSA-wrapped AES key | nonce prefix (7)
+#   segments: AES-GCM ciphertext || tag (16), each segment_size bytes of
+#             plaintext except the last one
+#
+# Segment i is encrypted with nonce = prefix || i (4 bytes) || last flag (1) and
+# the header as associated data, so reordered, duplicated, truncated or
+# extended streams all fail authentication.
+
+STREAM_MAGIC = b'SSVS'
+STREAM_VERSION = 1
+DEFAULT_SEGMENT_SIZE = 64 * 1024
+TAG_SIZE = 16
+
+_HEADER = struct.Struct('>4sBIH')
+_NONCE_PREFIX_SIZE = 7
+_COUNTER = struct.Struct('>IB')
+
+def _reader(source):
+    """Return a read(n) function over a file-like object or an iterable of bytes"""
+    if hasattr(source, 'read'):
+        def read_file(size):
+            parts = []
+            while size > 0:
+                chunk = source.read(size)
+                if not chunk:
+                    break
+                parts.append(chunk)
+                size -= len(chunk)
+            return b''.join(parts)
+        return read_file
+
+    chunks = iter(source)
+    buffer = bytearray()
+
+    def read_iter(size):
+        while len(buffer) < size:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            buffer.extend(chunk)
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+    return read_iter
+
+def segment_nonce(prefix, index, last):
+    if index > 0xFFFFFFFF:
+        raise ValueError("Stream has too many segments")
+    return prefix + _COUNTER.pack(index, 1 if last else 0)
+
+def stream_header(encrypted_aes_key, nonce_prefix, segment_size):
+    return _HEADER.pack(STREAM_MAGIC, STREAM_VERSION, segment_size, len(encrypted_aes_key)) + encrypted_aes_key + nonce_prefix
+
+def encrypted_stream_size(plaintext_size, segment_size=DEFAULT_SEGMENT_SIZE, wrapped_key_size=256):
+    """Size of the encrypted stream for a plaintext of the given size (RSA-2048 by default)"""
+    segments = max(1, -(-plaintext_size // segment_size))
+    header = _HEADER.size + wrapped_key_size + _NONCE_PREFIX_SIZE
+    return header + plaintext_size + segments * TAG_SIZE
+
+def read_stream_header(read):
+    """Parse a stream header; returns (header bytes, encrypted AES key, nonce prefix, segment size)"""
+    fixed = read(_HEADER.size)
+    if len(fixed) < _HEADER.size:
+        raise ValueError("Encrypted stream is truncated")
+    magic, version, segment_size, key_length = _HEADER.unpack(fixed)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Not an encrypted SonicStegnoVault stream")
+    if version != STREAM_VERSION:
+        raise ValueError(f"Unsupported stream version: {version}")
+    if segment_size < 1:
+        raise ValueError("Invalid stream segment size")
+    rest = read(key_length + _NONCE_PREFIX_SIZE)
+    if len(rest) < key_length + _NONCE_PREFIX_SIZE:
+        raise ValueError("Encrypted stream is truncated")
+    return fixed + rest, rest[:key_length], rest[key_length:], segment_size
+
+def iter_segments(read, segment_size):
+    """Yield (index, segment, last) for fixed-size segments, looking one segment ahead to spot the end"""
+    index = 0
+    current = read(segment_size)
+    while True:
+        following = read(segment_size) if len(current) == segment_size else b''
+        last = not following
+        yield index, current, last
+        if last:
+            return
+        current = following
+        index += 1
+
+def _map_ordered(function, items, workers):
+    """
+    Apply function to each argument tuple, on a thread pool when workers > 1,
+    yielding results in input order. At most 2 * workers segments are in
+    flight, so memory stays bounded by the segment size.
+    """
+    if workers <= 1:
+        for item in items:
+            yield function(*item)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for item in items:
+            window.append(pool.submit(function, *item))
+            if len(window) >= 2 * workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def encrypt_stream(source, public_key_path='public.pem', segment_size=DEFAULT_SEGMENT_SIZE, workers=1):
+    """
+    Encrypt a file-like object or iterable of bytes segment by segment.
+    Yields the header and then one encrypted segment at a time, so memory
+    use is bounded by the segment size whatever the payload size.
+
+    With workers > 1 segments are encrypted concurrently on a thread pool
+    (pycryptodome releases the GIL in its C code); the output is identical.
+    """
+    aes_key = get_random_bytes(16)
+    nonce_prefix = get_random_bytes(_NONCE_PREFIX_SIZE)
+    header = stream_header(wrap_key(aes_key, load_public_key(public_key_path)), nonce_prefix, segment_size)
+    yield header
+    yield from _encrypt_segments(_reader(source), aes_key, nonce_prefix, header, segment_size, workers)
+
+def _encrypt_segments(read, aes_key, nonce_prefix, header, segment_size, workers):
+    def encrypt_segment(index, segment, last):
+        cipher = AES.new(aes_key, AES.MODE_GCM, nonce=segment_nonce(nonce_prefix, index, last))
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(segment)
+        return ciphertext + tag
+
+    return _map_ordered(encrypt_segment, iter_segments(read, segment_size), workers)
+
+def decrypt_stream(source, private_key_path='private.pem', workers=1):
+    """
+    Decrypt a stream written by encrypt_stream from a file-like object or an
+    iterable of bytes, yielding plaintext one segment at a time. Raises
+    ValueError if any segment fails authentication or the stream is cut short.
+    workers decrypts segments concurrently as in encrypt_stream.
+    """
+    read = _reader(source)
+    header, encrypted_aes_key, nonce_prefix, segment_size = read_stream_header(read)
+    aes_key = unwrap_key(encrypted_aes_key, load_private_key(private_key_path))
+    yield from _decrypt_segments(read, aes_key, nonce_prefix, header, segment_size, workers)
+
+def _decrypt_segments(read, aes_key, nonce_prefix, header, segment_size, workers):
+    def decrypt_segment(index, segment, last):
+        if len(segment) < TAG_SIZE:
+            raise ValueError("Encrypted stream is truncated")
+        cipher = AES.new(aes_key, AES.MODE_GCM, nonce=segment_nonce(nonce_prefix, index, last))
+        cipher.update(header)
+        return cipher.decrypt_and_verify(segment[:-TAG_SIZE], segment[-TAG_SIZE:])
+
+    return _map_ordered(decrypt_segment, iter_segments(read, segment_size + TAG_SIZE), workers)
+
+def encrypt_file(src, dst, public_key_path='public.pem', segment_size=DEFAULT_SEGMENT_SIZE, workers=1):
+    """Encrypt one open binary file into another with constant memory"""
+    for chunk in encrypt_stream(src, public_key_path, segment_size, workers):
+        dst.write(chunk)
+
+def decrypt_file(src, dst, private_key_path='private.pem', workers=1):
+    """Decrypt one open binary file into another with constant memory"""
+    for chunk in decrypt_stream(src, private_key_path, workers):
+        dst.write(chunk)
+
+def _time_segments(data, aes_key, nonce_prefix, header, segment_size, workers):
+    """Seconds to encrypt data and to decrypt the result, segment work only"""
+    started = time.perf_counter()
+    encrypted = b''.join(_encrypt_segments(_reader([data]), aes_key, nonce_prefix, header, segment_size, workers))
+    encrypt_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in _decrypt_segments(_reader([encrypted]), aes_key, nonce_prefix, header, segment_size, workers):
+        pass
+    return encrypt_seconds, time.perf_counter() - started
+
+def benchmark_workers(size_mb=64, segment_size=1024 * 1024, max_workers=None,
+                      public_key_path='public.pem', private_key_path='private.pem'):
+    """
+    Measure encrypt and decrypt throughput in MB/s for 1, 2, 4, ... worker
+    threads up to max_workers (the CPU count by default). The header is built
+    and the key unwrapped once, outside the timed region, so only the segment
+    ciphers are measured; each worker count gets an untimed warm-up run.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    data = get_random_bytes(size_mb * 1024 * 1024)
+    nonce_prefix = get_random_bytes(_NONCE_PREFIX_SIZE)
+    header = stream_header(wrap_key(get_random_bytes(16), load_public_key(public_key_path)), nonce_prefix, segment_size)
+    _, encrypted_aes_key, _, _ = read_stream_header(_reader([header]))
+    aes_key = unwrap_key(encrypted_aes_key, load_private_key(private_key_path))
+    warm_up = data[:2 * max_workers * segment_size]
+    results = {}
+    workers = 1
+    while True:
+        _time_segments(warm_up, aes_key, nonce_prefix, header, segment_size, workers)
+        encrypt_seconds, decrypt_seconds = _time_segments(data, aes_key, nonce_prefix, header, segment_size, workers)
+        results[workers] = {'encrypt_mb_s': size_mb / encrypt_seconds, 'decrypt_mb_s': size_mb / decrypt_seconds}
+        if workers >= max_workers:
+            return results
+        workers = min(workers * 2, max_workers)
+
+if __name__ == "__main__":
+    for workers, result in benchmark_workers().items():
+        print(f"{workers:3d} workers: encrypt {result['encrypt_mb_s']:8.1f} MB/s, decrypt {result['decrypt_mb_s']:8.1f} MB/s")
@@ -1,46 +1,45 @@
-from encryption.key_generation import generate_keys
+from encryption.keystore import ensure_recipient_keys
 from encryption.encrypt_audio import encrypt_audio
-from encryption.decrypt_audio import decrypt_audio
+from encryption.decrypt_audio import decrypt_envelope
 from steganography.embed_audio import embed_data_into_image
 from steganography.extract_audio import extract_data_from_image
 from utils.graph_generator import plot_waveform
-from compress import compress_audio_numpy  # Import the compression function
+from steganography.compression import CODECS, compress_payload, decompress_payload, reduce_wav
 
 def main():
     choice = input("Do you want to perform encryption or decryption? (e/d): ").strip().lower()
 
     if choice == 'e':
-        # Ask the user for the compression factor
-        compression_factor = int(input("Enter the compression factor (e.g., 256 for 8-bit): "))
+        # Ask the user for the codec and whether to downmix to mono
+        codec = input(f"Enter the codec (auto/{'/'.join(CODECS)}, default auto): ").strip() or 'auto'
+        downmix = input("Downmix to mono before compressing? (y/n): ").strip().lower() == 'y'
 
-        # Compress the audio file
-        compress_audio_numpy('audio.wav', 'compressed_audio.wav', compression_factor)
+        # Reuse the recipient's RSA keys, creating them on first use
+        ensure_recipient_keys()
 
-        # Generate RSA keys
-        generate_keys()
-
-        # Read compressed audio file
-        with open('compressed_audio.wav', 'rb') as audio_file:
+        # Read audio file
+        with open('audio.wav', 'rb') as audio_file:
             audio_data = audio_file.read()
+        if downmix:
+            audio_data = reduce_wav(audio_data, channels=1)
 
-        # Encrypt audio data
-        encrypted_aes_key, nonce, tag, ciphertext = encrypt_audio(audio_data)
+        # Compress, then encrypt audio data
+        envelope = encrypt_audio(compress_payload(audio_data, codec))
 
         # Plot original audio waveform
         plot_waveform(audio_data, 'Original Audio Waveform')
 
         # Embed encrypted data into image
-        embed_data_into_image('image.png', (encrypted_aes_key, nonce, tag, ciphertext), 'stego_image.png')
+        embed_data_into_image('image.png', envelope, 'stego_image.png')
 
         print("Encryption completed and data embedded into stego_image.png")
 
     elif choice == 'd':
         # Extract encrypted data from image
         extracted_data = extract_data_from_image('stego_image.png')
-        encrypted_aes_key_ext, nonce_ext, tag_ext, ciphertext_ext = extracted_data
 
         # Decrypt audio data
-        decrypted_audio_data = decrypt_audio(encrypted_aes_key_ext, nonce_ext, tag_ext, ciphertext_ext)
+        decrypted_audio_data = decompress_payload(decrypt_envelope(extracted_data))
 
         # Plot decrypted audio waveform
         plot_waveform(decrypted_audio_data, 'Decrypted Audio Waveform')
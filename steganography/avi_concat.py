@@ -0,0 +1,154 @@
+import struct
+
+# Stream-copy concatenation of AVI files written by the same encoder settings,
+# so segment-parallel embedding can join its pieces without decoding and
+# re-encoding every frame. Only single-stream AVI 1.0 files with an idx1
+# index are handled; anything else raises ValueError and the caller falls
+# back to re-encoding.
+
+_CHUNK = struct.Struct('<4sI')
+_IDX1_ENTRY = struct.Struct('<4sIII')
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+# Keep well inside the 2 GB that AVI 1.0 readers accept
+MAX_AVI_SIZE = 1 << 30
+
+# Byte offsets of the fields that change when frames are added
+_AVIH_FLAGS = 12
+_AVIH_TOTAL_FRAMES = 16
+_AVIH_BUFFER_SIZE = 28
+_STRH_LENGTH = 32
+_STRH_BUFFER_SIZE = 36
+
+def _walk(f, start, end):
+    """Yield (chunk id, list type or None, data offset, size) for the chunks in [start, end)"""
+    position = start
+    while position + _CHUNK.size <= end:
+        f.seek(position)
+        chunk_id, size = _CHUNK.unpack(f.read(_CHUNK.size))
+        if chunk_id in (b'RIFF', b'LIST'):
+            yield chunk_id, f.read(4), position + 12, size - 4
+        else:
+            yield chunk_id, None, position + 8, size
+        position += 8 + size + (size & 1)
+
+def read_avi_frames(path):
+    """
+    Return (avih, strh, strf, frames) for a single-stream AVI, where frames is
+    a list of (chunk id, idx1 flags, data offset, size) in stream order.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        riffs = list(_walk(f, 0, file_size))
+        if not riffs or riffs[0][:2] != (b'RIFF', b'AVI '):
+            raise ValueError(f"Not an AVI file: {path}")
+        if len(riffs) > 1:
+            raise ValueError(f"OpenDML (multi-RIFF) AVI is not supported: {path}")
+        _, _, riff_start, riff_size = riffs[0]
+
+        avih = strh = strf = None
+        movi = []
+        flags = []
+        streams = 0
+        for chunk_id, list_type, offset, size in _walk(f, riff_start, riff_start + riff_size):
+            if list_type == b'hdrl':
+                for sub_id, sub_type, sub_offset, sub_size in _walk(f, offset, offset + size):
+                    if sub_id == b'avih':
+                        f.seek(sub_offset)
+                        avih = f.read(sub_size)
+                    elif sub_type == b'strl':
+                        streams += 1
+                        for s_id, _, s_offset, s_size in _walk(f, sub_offset, sub_offset + sub_size):
+                            if s_id in (b'strh', b'strf'):
+                                f.seek(s_offset)
+                                if s_id == b'strh':
+                                    strh = f.read(s_size)
+                                else:
+                                    strf = f.read(s_size)
+            elif list_type == b'movi':
+                for sub_id, sub_type, sub_offset, sub_size in _walk(f, offset, offset + size):
+                    if sub_type is not None:
+                        raise ValueError(f"Nested lists in movi are not supported: {path}")
+                    if sub_id[2:] in (b'dc', b'db'):
+                        movi.append((sub_id, sub_offset, sub_size))
+            elif chunk_id == b'idx1':
+                f.seek(offset)
+                table = f.read(size)
+                for entry in range(size // _IDX1_ENTRY.size):
+                    entry_id, entry_flags, _, _ = _IDX1_ENTRY.unpack_from(table, entry * _IDX1_ENTRY.size)
+                    if entry_id[2:] in (b'dc', b'db'):
+                        flags.append(entry_flags)
+
+    if streams != 1 or avih is None or strh is None or strf is None:
+        raise ValueError(f"Expected exactly one video stream: {path}")
+    if len(flags) != len(movi):
+        raise ValueError(f"Missing or inconsistent idx1 index: {path}")
+    frames = [(chunk_id, entry_flags, offset, size) for (chunk_id, offset, size), entry_flags in zip(movi, flags)]
+    return avih, strh, strf, frames
+
+def _chunk(chunk_id, data):
+    return _CHUNK.pack(chunk_id, len(data)) + data + (b'\0' if len(data) & 1 else b'')
+
+def _list(list_type, data):
+    return _CHUNK.pack(b'LIST', len(data) + 4) + list_type + data
+
+def concat_avi(paths, output_path):
+    """
+    Join AVI files into output_path by copying their compressed frames. Every
+    input must carry the same stream format and start on a keyframe, which
+    holds for segments written by separate encoder instances with one profile.
+    """
+    segments = [read_avi_frames(path) for path in paths]
+    avih, strh, strf, _ = segments[0]
+    for path, (_, other_strh, other_strf, frames) in zip(paths, segments):
+        if other_strf != strf or other_strh[:8] != strh[:8]:
+            raise ValueError(f"Stream format differs from the first segment: {path}")
+        if frames and not frames[0][1] & AVIIF_KEYFRAME:
+            raise ValueError(f"Segment does not start on a keyframe: {path}")
+
+    frames = [(path, frame) for path, segment in zip(paths, segments) for frame in segment[3]]
+    largest = max((size for _, (_, _, _, size) in frames), default=0)
+
+    avih = bytearray(avih)
+    struct.pack_into('<I', avih, _AVIH_FLAGS, struct.unpack_from('<I', avih, _AVIH_FLAGS)[0] | AVIF_HASINDEX)
+    struct.pack_into('<I', avih, _AVIH_TOTAL_FRAMES, len(frames))
+    struct.pack_into('<I', avih, _AVIH_BUFFER_SIZE, largest)
+    strh = bytearray(strh)
+    struct.pack_into('<I', strh, _STRH_LENGTH, len(frames))
+    struct.pack_into('<I', strh, _STRH_BUFFER_SIZE, largest)
+    hdrl = _list(b'hdrl', _chunk(b'avih', bytes(avih)) + _list(b'strl', _chunk(b'strh', bytes(strh)) + _chunk(b'strf', strf)))
+
+    movi_size = 4 + sum(8 + size + (size & 1) for _, (_, _, _, size) in frames)
+    idx1_size = _IDX1_ENTRY.size * len(frames)
+    riff_size = 4 + len(hdrl) + 8 + movi_size + 8 + idx1_size
+    if riff_size > MAX_AVI_SIZE:
+        raise ValueError("Joined AVI would exceed the AVI 1.0 size limit")
+
+    index = bytearray()
+    with open(output_path, 'wb') as out:
+        out.write(_CHUNK.pack(b'RIFF', riff_size) + b'AVI ')
+        out.write(hdrl)
+        out.write(_CHUNK.pack(b'LIST', movi_size) + b'movi')
+        # idx1 offsets are relative to the 'movi' fourcc
+        position = 4
+        current_path, source = None, None
+        try:
+            for path, (chunk_id, flags, offset, size) in frames:
+                if path != current_path:
+                    if source:
+                        source.close()
+                    current_path, source = path, open(path, 'rb')
+                source.seek(offset)
+                data = source.read(size)
+                if len(data) != size:
+                    raise ValueError(f"Truncated frame in {path}")
+                out.write(_chunk(chunk_id, data))
+                index += _IDX1_ENTRY.pack(chunk_id, flags, position, size)
+                position += 8 + size + (size & 1)
+        finally:
+            if source:
+                source.close()
+        out.write(_CHUNK.pack(b'idx1', idx1_size))
+        out.write(index)
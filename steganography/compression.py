@@ -0,0 +1,279 @@
+import bz2
+import io
+import lzma
+import math
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from scipy.signal import resample_poly
+
+from steganography.wav_chunks import (SUPPORTED_SAMPWIDTHS, WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM,
+                                      check_sample_format, parse_wav_layout)
+
+# Compression stage for the secret audio, applied before encryption (ciphertext
+# does not compress). Every byte saved is eight fewer carrier LSBs to rewrite.
+#
+#   frame: magic (4) | codec id (1) | original length (8) | codec body
+#
+# Data without the magic is passed through untouched, so payloads written
+# before this stage existed keep decrypting to the original audio.
+
+FRAME_MAGIC = b'SSVZ'
+_FRAME = struct.Struct('>4sBQ')
+
+Codec = namedtuple('Codec', ['name', 'codec_id', 'compress', 'decompress'])
+
+def _store(data):
+    return bytes(data)
+
+# PCM delta codec: the WAV header and any trailing chunks are kept verbatim,
+# samples are replaced by per-channel first differences (modulo the sample
+# width, so the round trip is exact) and split into byte planes. Differences
+# of smooth audio are small, which leaves the high-byte planes nearly
+# constant for the entropy coder.
+_DELTA_PARTS = struct.Struct('>II')
+_DELTA_DTYPES = {1: np.dtype(np.uint8), 2: np.dtype('<u2'), 3: np.dtype('<u4'), 4: np.dtype('<u4')}
+
+def _pcm_layout(data):
+    layout = parse_wav_layout(io.BytesIO(data))
+    if layout.format_tag != WAVE_FORMAT_PCM or layout.sampwidth not in _DELTA_DTYPES:
+        raise ValueError("pcm-delta needs integer PCM samples")
+    return layout
+
+def _samples_to_uint(planes, sampwidth):
+    """Assemble (n, sampwidth) little-endian bytes into unsigned integers"""
+    if sampwidth != 3:
+        return np.ascontiguousarray(planes).view(_DELTA_DTYPES[sampwidth]).ravel()
+    planes = planes.astype(np.uint32)
+    return planes[:, 0] | (planes[:, 1] << 8) | (planes[:, 2] << 16)
+
+def _uint_to_samples(values, sampwidth):
+    """Inverse of _samples_to_uint, returning (n, sampwidth) bytes"""
+    return values.astype(_DELTA_DTYPES[sampwidth]).view(np.uint8).reshape(-1, _DELTA_DTYPES[sampwidth].itemsize)[:, :sampwidth]
+
+def _delta_compress(data):
+    data = bytes(data)
+    layout = _pcm_layout(data)
+    block_align = layout.channels * layout.sampwidth
+    data_end = min(layout.data_offset + layout.data_size, len(data))
+    frames = (data_end - layout.data_offset) // block_align
+    samples_end = layout.data_offset + frames * block_align
+
+    raw = np.frombuffer(data, dtype=np.uint8, count=frames * block_align, offset=layout.data_offset)
+    values = _samples_to_uint(raw.reshape(-1, layout.sampwidth), layout.sampwidth).reshape(frames, layout.channels)
+    deltas = values.copy()
+    deltas[1:] -= values[:-1]
+    if layout.sampwidth == 3:
+        deltas &= 0xFFFFFF
+    planes = _uint_to_samples(deltas.ravel(), layout.sampwidth).T.tobytes()
+
+    head, tail = data[:layout.data_offset], data[samples_end:]
+    return _DELTA_PARTS.pack(len(head), len(tail)) + head + tail + zlib.compress(planes, 6)
+
+def _delta_decompress(body):
+    body = memoryview(body)
+    head_size, tail_size = _DELTA_PARTS.unpack_from(body)
+    head = bytes(body[_DELTA_PARTS.size:_DELTA_PARTS.size + head_size])
+    tail = bytes(body[_DELTA_PARTS.size + head_size:_DELTA_PARTS.size + head_size + tail_size])
+    layout = _pcm_layout(head)
+
+    planes = np.frombuffer(zlib.decompress(body[_DELTA_PARTS.size + head_size + tail_size:]), dtype=np.uint8)
+    deltas = _samples_to_uint(planes.reshape(layout.sampwidth, -1).T, layout.sampwidth).reshape(-1, layout.channels)
+    values = np.cumsum(deltas, axis=0, dtype=deltas.dtype)
+    if layout.sampwidth == 3:
+        values &= 0xFFFFFF
+    return head + _uint_to_samples(values.ravel(), layout.sampwidth).tobytes() + tail
+
+CODECS = {
+    'none': Codec('none', 0, _store, _store),
+    'zlib': Codec('zlib', 1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': Codec('lzma', 2, lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    'bz2': Codec('bz2', 3, lambda data: bz2.compress(data, 9), bz2.decompress),
+    'pcm-delta': Codec('pcm-delta', 4, _delta_compress, _delta_decompress),
+}
+_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+# 'auto' samples the payload and picks a codec with select_codec
+DEFAULT_CODEC = 'auto'
+
+# Codec selection: compress a few evenly spaced windows with every codec,
+# extrapolate size and time to the whole payload, and take the smallest
+# output whose estimated time fits the CPU budget. A codec must beat a
+# cheaper one by MIN_GAIN of the payload size to be worth its extra time.
+DEFAULT_CPU_BUDGET = 0.5
+SAMPLE_WINDOWS = 4
+SAMPLE_WINDOW_SIZE = 32 * 1024
+MIN_GAIN = 0.02
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
+
+def _sample_windows(data, windows, window_size):
+    """
+    Return evenly spaced windows of data. For a PCM WAV each window is the
+    header followed by whole frames, so pcm-delta can be sampled as well.
+    """
+    try:
+        layout = _pcm_layout(data)
+        head = data[:layout.data_offset]
+        align = layout.channels * layout.sampwidth
+        body = data[layout.data_offset:layout.data_offset + layout.data_size]
+    except (ValueError, struct.error):
+        head, align, body = b'', 1, data
+    if len(body) <= windows * window_size:
+        return [data]
+    window_size -= window_size % align
+    stride = (len(body) - window_size) // (windows - 1) if windows > 1 else 0
+    starts = [i * stride - (i * stride) % align for i in range(windows)]
+    return [head + body[start:start + window_size] for start in starts]
+
+def estimate_codecs(data, windows=SAMPLE_WINDOWS, window_size=SAMPLE_WINDOW_SIZE):
+    """
+    Estimate each codec's compressed size and compression time for data from
+    sampled windows. Returns {name: {'size': bytes, 'seconds': s}}; codecs that
+    do not apply to the data are left out.
+    """
+    data = bytes(data)
+    samples = _sample_windows(data, windows, window_size)
+    sampled = sum(len(sample) for sample in samples)
+    scale = len(data) / sampled if sampled else 0.0
+    estimates = {}
+    for name, codec in CODECS.items():
+        started = time.perf_counter()
+        try:
+            size = sum(len(codec.compress(sample)) for sample in samples)
+        except ValueError:
+            continue
+        elapsed = time.perf_counter() - started
+        estimates[name] = {'size': int(size * scale), 'seconds': elapsed * scale}
+    return estimates
+
+def select_codec(data, cpu_budget=DEFAULT_CPU_BUDGET, estimates=None):
+    """Pick the codec with the smallest estimated output that fits cpu_budget seconds"""
+    estimates = estimates or estimate_codecs(data)
+    affordable = sorted((estimate['seconds'], name) for name, estimate in estimates.items()
+                        if estimate['seconds'] <= cpu_budget or name == 'none')
+    margin = MIN_GAIN * len(data)
+    best = 'none'
+    for _, name in affordable:
+        if estimates[name]['size'] < estimates[best]['size'] - margin:
+            best = name
+    return best
+
+def compress_payload(data, codec=DEFAULT_CODEC, cpu_budget=DEFAULT_CPU_BUDGET):
+    """
+    Compress data into a self-describing frame. codec='auto' chooses one with
+    select_codec under cpu_budget seconds. pcm-delta falls back to zlib for
+    anything that is not an integer PCM WAV; the frame records the codec that
+    was actually used.
+    """
+    data = bytes(data)
+    if codec == 'auto':
+        codec = select_codec(data, cpu_budget)
+    selected = get_codec(codec)
+    try:
+        body = selected.compress(data)
+    except ValueError:
+        if selected.name != 'pcm-delta':
+            raise
+        selected = CODECS['zlib']
+        body = selected.compress(data)
+    return _FRAME.pack(FRAME_MAGIC, selected.codec_id, len(data)) + body
+
+def is_compressed(data):
+    return bytes(data[:len(FRAME_MAGIC)]) == FRAME_MAGIC
+
+def decompress_payload(data):
+    """Undo compress_payload; data without a frame header is returned as is"""
+    if not is_compressed(data):
+        return bytes(data)
+    view = memoryview(data).cast('B')
+    if len(view) < _FRAME.size:
+        raise ValueError("Compressed payload is truncated")
+    _, codec_id, length = _FRAME.unpack_from(view)
+    if codec_id not in _BY_ID:
+        raise ValueError(f"Unknown codec id in payload: {codec_id}")
+    data = _BY_ID[codec_id].decompress(view[_FRAME.size:])
+    if len(data) != length:
+        raise ValueError("Decompressed payload has the wrong length")
+    return bytes(data)
+
+_WAV_CHUNK = struct.Struct('<4sI')
+_WAV_FMT = struct.Struct('<HHIIHH')
+
+def _pcm_to_float(raw, sampwidth):
+    """Decode little-endian PCM bytes to floats in [-1, 1)"""
+    if sampwidth == 1:
+        return (np.frombuffer(raw, dtype=np.uint8).astype(np.float64) - 128) / 128
+    if sampwidth == 3:
+        planes = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = planes[:, 0] | (planes[:, 1] << 8) | (planes[:, 2] << 16)
+        return np.where(values >= 1 << 23, values - (1 << 24), values) / float(1 << 23)
+    dtype = np.dtype(f'<i{sampwidth}')
+    return np.frombuffer(raw, dtype=dtype).astype(np.float64) / float(1 << (8 * sampwidth - 1))
+
+def _float_to_pcm(samples, sampwidth):
+    """Encode floats in [-1, 1) as little-endian PCM bytes"""
+    scale = 1 << (8 * sampwidth - 1)
+    values = np.clip(np.round(samples * scale), -scale, scale - 1).astype(np.int64)
+    if sampwidth == 1:
+        return (values + 128).astype(np.uint8).tobytes()
+    if sampwidth == 3:
+        return values.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return values.astype(f'<i{sampwidth}').tobytes()
+
+def _read_samples(data):
+    """Return (samples as float64 of shape (frames, channels), layout) for a PCM or IEEE float WAV"""
+    layout = parse_wav_layout(io.BytesIO(data))
+    check_sample_format(layout)
+    raw = data[layout.data_offset:layout.data_offset + layout.data_size]
+    frame_size = layout.channels * layout.sampwidth
+    raw = raw[:len(raw) - len(raw) % frame_size]
+    if layout.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        samples = np.frombuffer(raw, dtype=f'<f{layout.sampwidth}').astype(np.float64)
+    else:
+        samples = _pcm_to_float(raw, layout.sampwidth)
+    return samples.reshape(-1, layout.channels), layout
+
+def _wav_bytes(format_tag, channels, framerate, sampwidth, frames):
+    """A minimal RIFF/WAVE file: a 16-byte fmt chunk followed by the data chunk"""
+    block_align = channels * sampwidth
+    fmt = _WAV_FMT.pack(format_tag, channels, framerate, framerate * block_align, block_align, sampwidth * 8)
+    body = (b'WAVE' + _WAV_CHUNK.pack(b'fmt ', len(fmt)) + fmt
+            + _WAV_CHUNK.pack(b'data', len(frames)) + frames + b'\0' * (len(frames) & 1))
+    return _WAV_CHUNK.pack(b'RIFF', len(body)) + body
+
+def reduce_wav(data, channels=None, framerate=None, sampwidth=None):
+    """
+    Lossy size reduction for a PCM or IEEE float WAV before compression:
+    downmix to fewer channels (averaging), resample to framerate (polyphase
+    filtering, so no aliasing) and/or requantize to sampwidth-byte PCM. Float
+    input stays float unless sampwidth is given. Returns the new WAV file as
+    bytes; raises ValueError for data that is not a supported WAV.
+    """
+    samples, layout = _read_samples(bytes(data))
+    rate = layout.framerate
+    if channels is not None and channels < layout.channels:
+        if channels == 1:
+            samples = samples.mean(axis=1, keepdims=True)
+        else:
+            samples = samples[:, :channels]
+    if framerate is not None and framerate != rate and len(samples):
+        common = math.gcd(framerate, rate)
+        samples = resample_poly(samples, framerate // common, rate // common, axis=0)
+        rate = framerate
+
+    if sampwidth is None and layout.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        frames = samples.astype(f'<f{layout.sampwidth}').tobytes()
+        return _wav_bytes(WAVE_FORMAT_IEEE_FLOAT, samples.shape[1], rate, layout.sampwidth, frames)
+    width = sampwidth or layout.sampwidth
+    if width not in SUPPORTED_SAMPWIDTHS[WAVE_FORMAT_PCM]:
+        raise ValueError(f"Unsupported PCM sample width: {width * 8} bits")
+    return _wav_bytes(WAVE_FORMAT_PCM, samples.shape[1], rate, width, _float_to_pcm(samples.ravel(), width))
+
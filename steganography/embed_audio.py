@@ -1,36 +1,42 @@
 from PIL import Image
 import numpy as np
-import base64
+import struct
 from utils.error_handling import handle_size_mismatch
+from steganography.lsb import bytes_to_bits, embed_bits
+from steganography.payload import pack_payload
+
+# Stego images start with a magic tag and the payload length in bits, so the
+# extractor can stop reading as soon as the payload ends
+IMAGE_MAGIC = b'SSVI'
+IMAGE_HEADER = struct.Struct('>4sI')
+
+def embed_bytes_into_image(image_path, payload, output_path):
+    """
+    Embed raw payload bytes into the RGB least significant bits of an image.
+    The payload is prefixed with IMAGE_HEADER and bits are written pixel by
+    pixel in R, G, B order.
+    """
+    header = IMAGE_HEADER.pack(IMAGE_MAGIC, len(payload) * 8)
+    data_bits = bytes_to_bits(header + bytes(payload))
 
-def embed_data_into_image(image_path, data_tuple, output_path):
-    import pickle
-    data = pickle.dumps(data_tuple)
-    data_b64 = base64.b64encode(data)
-    data_bits = ''.join(format(byte, '08b') for byte in data_b64)
-    
     image = Image.open(image_path)
     image_data = np.array(image)
-    
-    total_bits = image_data.size * 3
-    if len(data_bits) > total_bits:
+
+    # Only the R, G, B channels carry data; alpha is left untouched
+    channels = image_data[..., :3]
+    if data_bits.size > channels.size:
         handle_size_mismatch()
-    
-    data_index = 0
-    for i in range(image_data.shape[0]):
-        for j in range(image_data.shape[1]):
-            pixel = image_data[i, j]
-            for k in range(3):  # R, G, B channels
-                if data_index < len(data_bits):
-                    pixel[k] = (pixel[k] & 0b11111110) | int(data_bits[data_index])
-                    data_index += 1
-            image_data[i, j] = pixel
-            if data_index >= len(data_bits):
-                break
-        if data_index >= len(data_bits):
-            break
-    
+
+    # A view for RGB images, a copy for RGBA that is written back below
+    flat = channels.reshape(-1)
+    embed_bits(flat, data_bits)
+    if not np.shares_memory(flat, image_data):
+        channels[...] = flat.reshape(channels.shape)
+
     encoded_image = Image.fromarray(image_data)
-    
+
     # Save the image with maximum compression
     encoded_image.save(output_path, format='PNG', optimize=True)
+
+def embed_data_into_image(image_path, data_tuple, output_path):
+    embed_bytes_into_image(image_path, pack_payload(data_tuple), output_path)
@@ -1,41 +1,115 @@
-import wave
-import pickle
-import base64
+import itertools
+import os
+import shutil
+import struct
 import numpy as np
 from utils.error_handling import handle_size_mismatch
+from steganography.lsb import BitStream, bit_range
+from steganography.payload import pack_payload
+from steganography.wav_chunks import read_wav_layout, check_sample_format, clone_file
+from steganography.wav_samples import sample_lsb_view, carrier_channels, bits_per_frame, write_lsb_bits
 
-def embed_data_into_audio(cover_audio_path, data_tuple, output_path):
+# 32-bit big-endian payload length in bits, written into the first samples
+AUDIO_HEADER = struct.Struct('>I')
+
+# Bits written per memmap slice when embedding in place
+_IN_PLACE_BLOCK = 1 << 20
+
+# Frames per block when streaming a payload into a carrier
+DEFAULT_STREAM_FRAMES = 1 << 16
+
+def _embed_in_place(cover_audio_path, full, output_path, layout, channels):
+    """Copy the cover and rewrite only the payload samples through a memory map of its data chunk"""
+    total_bits = len(full) * 8
+    frames = -(-total_bits // bits_per_frame(layout, channels))
+
+    if os.path.abspath(cover_audio_path) != os.path.abspath(output_path):
+        clone_file(cover_audio_path, output_path)
+    data = np.memmap(output_path, dtype=np.uint8, mode='r+', offset=layout.data_offset,
+                     shape=(frames * layout.channels * layout.sampwidth,))
+    lsb = sample_lsb_view(data, layout)
+    for start in range(0, total_bits, _IN_PLACE_BLOCK):
+        stop = min(total_bits, start + _IN_PLACE_BLOCK)
+        write_lsb_bits(lsb, bit_range(full, start, stop), start, channels)
+    data.flush()
+    del lsb, data
+
+def _embed_streaming(cover_audio_path, bits, total_bits, output_path, layout, channels, chunk_frames):
+    """Copy the cover block by block, embedding the next run of a BitStream into the blocks the payload covers"""
+    block_align = layout.channels * layout.sampwidth
+    block_bytes = (chunk_frames or layout.data_size // block_align or 1) * block_align
+    k = bits_per_frame(layout, channels)
+
+    with open(cover_audio_path, 'rb') as fin, open(output_path, 'wb') as fout:
+        # Headers and chunks before the samples are copied as-is
+        fout.write(fin.read(layout.data_offset))
+        remaining = layout.data_size
+        bit_idx = 0
+        while remaining > 0:
+            frames = fin.read(min(block_bytes, remaining))
+            if not frames:
+                break
+            remaining -= len(frames)
+            if bit_idx < total_bits:
+                # Embed bits into LSB of samples
+                frames = bytearray(frames)
+                lsb = sample_lsb_view(frames, layout)
+                stop = min(total_bits, bit_idx + lsb.shape[0] * k)
+                write_lsb_bits(lsb, bits.take(stop - bit_idx), 0, channels)
+                bit_idx = stop
+            fout.write(frames)
+        # Trailing chunks (LIST, cue, ...) are kept as well
+        shutil.copyfileobj(fin, fout)
+
+def _open_carrier(cover_audio_path, total_bits, channels):
+    """Read and validate the carrier format and check that total_bits fit"""
+    layout = read_wav_layout(cover_audio_path)
+    check_sample_format(layout)
+    channels = carrier_channels(layout, channels)
+
+    # Check capacity
+    frames = layout.data_size // (layout.channels * layout.sampwidth)
+    if total_bits > frames * bits_per_frame(layout, channels):
+        handle_size_mismatch()
+    return layout, channels
+
+def embed_data_into_audio(cover_audio_path, data_tuple, output_path, chunk_frames=None, in_place=False, channels=None):
     """
     Embed arbitrary data (e.g., encrypted audio) into a cover WAV audio file using LSB steganography.
+    8/16/24/32-bit PCM and 32/64-bit float carriers are supported directly.
+
+    With chunk_frames set, the cover is streamed in blocks of that many frames:
+    only the blocks the payload covers are modified and the rest are copied
+    through unchanged, so memory use does not grow with the carrier length.
+
+    With in_place set, the cover file is copied (as a reflink where the
+    filesystem supports it) and the payload samples are patched through a
+    memory map, so only the pages holding the payload are written.
+
+    channels restricts embedding to the given channel indices, e.g. [0] to
+    leave the right channel of a stereo carrier untouched; the extractor must
+    be given the same selection.
     """
-    # Serialize and encode the payload
-    data = pickle.dumps(data_tuple)
-    data_b64 = base64.b64encode(data)
-    bits = ''.join(format(byte, '08b') for byte in data_b64)
+    # Serialize the payload into the binary container
+    data = pack_payload(data_tuple)
     # Prefix length of payload bits as 32-bit header
-    length_header = '{:032b}'.format(len(bits))
-    full_bits = length_header + bits
-
-    # Read cover audio
-    with wave.open(cover_audio_path, 'rb') as audio:
-        params = audio.getparams()
-        frames = audio.readframes(params.nframes)
-    # Convert to numpy array
-    sampwidth = params.sampwidth
-    dtype = np.int16 if sampwidth == 2 else np.uint8
-    samples = np.frombuffer(frames, dtype=dtype)
+    full = memoryview(AUDIO_HEADER.pack(len(data) * 8) + data)
+    total_bits = len(full) * 8
 
-    # Check capacity
-    if len(full_bits) > samples.size:
-        handle_size_mismatch()
-
-    # Embed bits into LSB of samples
-    modified = samples.copy()
-    for idx, bit in enumerate(full_bits):
-        modified[idx] = (int(modified[idx]) & ~1) | int(bit)
+    layout, channels = _open_carrier(cover_audio_path, total_bits, channels)
+    if in_place:
+        _embed_in_place(cover_audio_path, full, output_path, layout, channels)
+    else:
+        _embed_streaming(cover_audio_path, BitStream([full]), total_bits, output_path, layout, channels, chunk_frames)
 
-    # Write stego audio
-    stego_frames = modified.tobytes()
-    with wave.open(output_path, 'wb') as out:
-        out.setparams(params)
-        out.writeframes(stego_frames)
+def embed_stream_into_audio(cover_audio_path, chunks, length, output_path, chunk_frames=DEFAULT_STREAM_FRAMES, channels=None):
+    """
+    Embed length bytes drawn from an iterable of byte chunks (such as
+    encryption.stream.encrypt_stream) into a cover WAV file, streaming both
+    the payload and the carrier so memory use stays constant. The payload is
+    written as-is behind the length header, without a payload container.
+    """
+    total_bits = (AUDIO_HEADER.size + length) * 8
+    layout, channels = _open_carrier(cover_audio_path, total_bits, channels)
+    bits = BitStream(itertools.chain([AUDIO_HEADER.pack(length * 8)], chunks))
+    _embed_streaming(cover_audio_path, bits, total_bits, output_path, layout, channels, chunk_frames)
@@ -1,55 +1,143 @@
 import cv2
-import pickle
-import base64
+import struct
 import numpy as np
 from utils.error_handling import handle_size_mismatch
+from steganography.lsb import bit_range, bytes_to_bits, embed_bits
+from steganography.payload import pack_payload
+from steganography.video_pipeline import run_video_pipeline
+from steganography.video_writers import open_capture, open_writer, select_profile
 
-def embed_data_into_video(cover_video_path, data_tuple, output_path):
+# 32-bit big-endian payload length in bits, written into the first pixels of frame 0
+VIDEO_HEADER = struct.Struct('>I')
+
+# Random-access index written at the start of frame 0 instead of VIDEO_HEADER
+# when the payload is placed at a chosen frame: magic, start frame, frame step,
+# frames used, payload bits per frame and payload length in bits. Frame i of
+# the payload is start + i * step and holds payload bits from i * bits per frame.
+VIDEO_INDEX_MAGIC = b'SSVX'
+VIDEO_INDEX = struct.Struct('>4sIIIII')
+
+def video_frame_plan(start_frame, frame_step, bits_per_frame, payload_bits, frame_bits):
+    """
+    Lay out an indexed payload over the frames. Returns a list of
+    (frame, payload bit offset, bit offset within the frame, bit count);
+    in frame 0 the payload starts after the index.
+    """
+    index_bits = VIDEO_INDEX.size * 8
+    if frame_step < 1 or bits_per_frame < 1:
+        raise ValueError("frame_step and bits_per_frame must be at least 1")
+    plan = []
+    offset = 0
+    frame = start_frame
+    while offset < payload_bits:
+        local = index_bits if frame == 0 else 0
+        count = min(bits_per_frame, frame_bits - local, payload_bits - offset)
+        if count <= 0:
+            raise ValueError("Frame 0 is too small to hold the payload index")
+        plan.append((frame, offset, local, count))
+        offset += count
+        frame += frame_step
+    return plan
+
+def embed_data_into_video(cover_video_path, data_tuple, output_path, pipeline_depth=None, embed_workers=1, profile=None,
+                          start_frame=0, frame_step=1, bits_per_frame=None):
     """
     Embed arbitrary data (e.g., encrypted audio) into a cover video file using LSB steganography on frames.
+    Each payload-bearing frame is written in one flattened-array operation; once
+    the payload is complete the remaining frames are passed straight to the writer.
+
+    With pipeline_depth set, decoding, embedding and encoding run as a threaded
+    pipeline holding at most that many frames in flight, with embed_workers
+    threads on the embed stage. Frames are written in their original order and
+    the per-stage statistics from run_video_pipeline are returned.
+
+    profile names an output profile from steganography.video_writers; by
+    default the fastest writer that round-trips losslessly for output_path's
+    container is used, so the embedded bits survive encoding.
+
+    start_frame, frame_step and bits_per_frame place the payload at chosen
+    frames (e.g. after an intro) and record a VIDEO_INDEX in frame 0, so the
+    extractor can seek straight to those frames. With the defaults the payload
+    starts at frame 0, pixel 0 behind the plain length header.
     """
-    # Serialize and encode payload
-    data = pickle.dumps(data_tuple)
-    data_b64 = base64.b64encode(data)
-    bits = ''.join(format(b, '08b') for b in data_b64)
-    # Prefix length header
-    length_header = '{:032b}'.format(len(bits))
-    full_bits = length_header + bits
-
-    cap = cv2.VideoCapture(cover_video_path)
+    # Serialize the payload into the binary container
+    data = pack_payload(data_tuple)
+    indexed = start_frame or frame_step != 1 or bits_per_frame
+
+    cap = open_capture(cover_video_path)
     if not cap.isOpened():
         raise IOError(f"Cannot open video file: {cover_video_path}")
     # Video properties
     fps = cap.get(cv2.CAP_PROP_FPS)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    frame_bits = width * height * 3
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    if indexed:
+        full = memoryview(data)
+        total_bits = len(full) * 8
+        per_frame = min(bits_per_frame or frame_bits, frame_bits)
+        try:
+            plan = video_frame_plan(start_frame, frame_step, per_frame, total_bits, frame_bits)
+        except ValueError:
+            cap.release()
+            raise
+        index_bits = bytes_to_bits(VIDEO_INDEX.pack(VIDEO_INDEX_MAGIC, start_frame, frame_step, len(plan),
+                                                    per_frame, total_bits))
+        parts = {frame: (offset, local, count) for frame, offset, local, count in plan}
+        frames_required = plan[-1][0] + 1
+    else:
+        # Prefix length header
+        full = memoryview(VIDEO_HEADER.pack(len(data) * 8) + data)
+        total_bits = len(full) * 8
+        frames_required = -(-total_bits // frame_bits)
 
-    capacity = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) * width * height * 3
-    if len(full_bits) > capacity:
+    if frames_required > frame_count:
+        cap.release()
         handle_size_mismatch()
 
-    bit_idx = 0
-    while True:
+    try:
+        out = open_writer(output_path, profile or select_profile(output_path, (width, height)), fps, (width, height))
+    except Exception:
+        cap.release()
+        raise
+
+    def embed_frame(index, frame):
+        # Embed into frame: pixels in row-major order, B, G, R per pixel
+        flat = frame.reshape(-1)
+        if indexed:
+            if index == 0:
+                embed_bits(flat, index_bits)
+            if index in parts:
+                offset, local, count = parts[index]
+                embed_bits(flat, bit_range(full, offset, offset + count), local)
+        elif index * frame_bits < total_bits:
+            start = index * frame_bits
+            stop = min(total_bits, start + flat.size)
+            embed_bits(flat, bit_range(full, start, stop))
+        return frame
+
+    def read_frame():
         ret, frame = cap.read()
-        if not ret:
-            break
-        # Embed into frame
-        for i in range(height):
-            for j in range(width):
-                for c in range(3):
-                    if bit_idx < len(full_bits):
-                        frame[i, j, c] = (int(frame[i, j, c]) & ~1) | int(full_bits[bit_idx])
-                        bit_idx += 1
-                    else:
-                        break
-                if bit_idx >= len(full_bits):
+        return frame if ret else None
+
+    stats = None
+    try:
+        if pipeline_depth:
+            stats = run_video_pipeline(read_frame, embed_frame, out.write, pipeline_depth, embed_workers)
+            frames_written = stats['encode']['frames']
+        else:
+            frames_written = 0
+            while True:
+                frame = read_frame()
+                if frame is None:
                     break
-            if bit_idx >= len(full_bits):
-                break
-        out.write(frame)
-    cap.release()
-    out.release()
-    if bit_idx < len(full_bits):
+                out.write(embed_frame(frames_written, frame))
+                frames_written += 1
+    finally:
+        cap.release()
+        out.release()
+    if frames_written < frames_required:
         handle_size_mismatch()
+    return stats
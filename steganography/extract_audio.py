@@ -1,30 +1,44 @@
 from PIL import Image
 import numpy as np
-import base64
-import pickle
+from steganography.embed_audio import IMAGE_MAGIC, IMAGE_HEADER
+from steganography.lsb import bits_to_bytes, extract_bits
+from steganography.payload import load_payload
 
-def extract_data_from_image(image_path):
-    # Open the image
+def _read_image_bits(image_data, start, count):
+    """Read count RGB LSBs starting at bit start, touching only the pixels involved"""
+    pixels = image_data.reshape(-1, image_data.shape[-1])
+    first = start // 3
+    last = -(-(start + count) // 3)
+    flat = pixels[first:last, :3].reshape(-1)
+    return extract_bits(flat, start - first * 3, count)
+
+def _extract_legacy_payload(image_data):
+    """Decode images written before the length header: scan every pixel and cut at the first zero byte"""
+    flat = image_data[..., :3].reshape(-1)
+    usable = flat.size - flat.size % 8
+    data_bytes = bits_to_bytes(extract_bits(flat, 0, usable))
+    return data_bytes.split(b'\x00')[0]  # Remove any padding zeros
+
+def extract_bytes_from_image(image_path):
+    """Return the raw payload bytes embedded by embed_bytes_into_image"""
     image = Image.open(image_path)
     image_data = np.array(image)
-    
-    bits = ''
-    for i in range(image_data.shape[0]):
-        for j in range(image_data.shape[1]):
-            pixel = image_data[i, j]
-            for k in range(3):
-                bits += str(pixel[k] & 1)
-    
-    # Convert bits to bytes
-    data_bytes = int(bits, 2).to_bytes(len(bits) // 8, byteorder='big')
-    
-    # Decode from base64
+
+    header_bits = IMAGE_HEADER.size * 8
+    capacity = image_data[..., :3].size
+    if capacity >= header_bits:
+        magic, length = IMAGE_HEADER.unpack(bits_to_bytes(_read_image_bits(image_data, 0, header_bits)))
+        if magic == IMAGE_MAGIC and header_bits + length <= capacity:
+            return bits_to_bytes(_read_image_bits(image_data, header_bits, length))
+    return _extract_legacy_payload(image_data)
+
+def extract_data_from_image(image_path):
+    data = extract_bytes_from_image(image_path)
+
     try:
-        data_b64 = data_bytes.split(b'\x00')[0]  # Remove any padding zeros
-        data = base64.b64decode(data_b64)
-        data_tuple = pickle.loads(data)
+        data_tuple = load_payload(data)
     except Exception as e:
         print("Error during data extraction:", e)
         exit()
 
-    return data_tuple
\ No newline at end of file
+    return data_tuple
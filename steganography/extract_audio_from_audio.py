@@ -1,36 +1,74 @@
-import wave
-import pickle
-import base64
-import numpy as np
-
 from utils.error_handling import handle_size_mismatch
+from steganography.embed_audio_in_audio import AUDIO_HEADER, DEFAULT_STREAM_FRAMES
+from steganography.lsb import BitAccumulator, bits_to_bytes
+from steganography.payload import load_payload
+from steganography.wav_chunks import read_wav_layout, check_sample_format
+from steganography.wav_samples import sample_lsb_view, carrier_channels, bits_per_frame, read_lsb_bits
 
-def extract_data_from_audio(stego_audio_path):
+def iter_audio_payload(stego_audio_path, chunk_frames=None, channels=None):
     """
-    Extract embedded data from a stego WAV audio file using LSB steganography.
+    Yield the bytes embedded in a stego WAV file block by block. Only the frames
+    that hold the header and payload are read; with chunk_frames set they are
+    read in blocks of that many frames.
     """
-    with wave.open(stego_audio_path, 'rb') as audio:
-        params = audio.getparams()
-        frames = audio.readframes(params.nframes)
-    sampwidth = params.sampwidth
-    dtype = np.int16 if sampwidth == 2 else np.uint8
-    samples = np.frombuffer(frames, dtype=dtype)
+    layout = read_wav_layout(stego_audio_path)
+    check_sample_format(layout)
+    channels = carrier_channels(layout, channels)
+    block_align = layout.channels * layout.sampwidth
+    total_frames = layout.data_size // block_align
+    k = bits_per_frame(layout, channels)
+    header_bits = AUDIO_HEADER.size * 8
 
-    # Extract bits
-    bits = ''.join(str(int(sample) & 1) for sample in samples)
-    # Get payload length
-    if len(bits) < 32:
-        handle_size_mismatch()
-    length = int(bits[:32], 2)
-    data_bits = bits[32:32 + length]
+    with open(stego_audio_path, 'rb') as audio:
+        # Get payload length
+        header_frames = -(-header_bits // k)
+        if header_frames > total_frames:
+            handle_size_mismatch()
+        audio.seek(layout.data_offset)
+        lsb = sample_lsb_view(audio.read(header_frames * block_align), layout)
+        (length,) = AUDIO_HEADER.unpack(bits_to_bytes(read_lsb_bits(lsb, 0, header_bits, channels)))
+
+        end = header_bits + length
+        payload_frames = -(-end // k)
+        if payload_frames > total_frames:
+            handle_size_mismatch()
+
+        # Collect payload bits block by block, carrying partial bytes over
+        audio.seek(layout.data_offset)
+        block = chunk_frames or payload_frames
+        bits = BitAccumulator()
+        frames_read = 0
+        while frames_read < payload_frames:
+            count = min(block, payload_frames - frames_read)
+            lsb = sample_lsb_view(audio.read(count * block_align), layout)
+            position = frames_read * k
+            frames_read += count
+            start = max(header_bits - position, 0)
+            stop = min(end - position, lsb.shape[0] * k)
+            if stop <= start:
+                continue
+            bits.append(read_lsb_bits(lsb, start, stop - start, channels))
+            data = bits.drain()
+            if data:
+                yield data
+    data = bits.getvalue()
+    if data:
+        yield data
 
+def extract_data_from_audio(stego_audio_path, chunk_frames=None, channels=None):
+    """
+    Extract embedded data from a stego WAV audio file using LSB steganography.
+    channels must match the selection used when embedding.
+    """
     # Convert bits to bytes
-    data_bytes = bytes(int(data_bits[i:i+8], 2) for i in range(0, len(data_bits), 8))
+    data_bytes = b''.join(iter_audio_payload(stego_audio_path, chunk_frames, channels))
 
-    # Decode and deserialize
+    # Parse the payload container
     try:
-        data_b64 = data_bytes
-        data = base64.b64decode(data_b64)
-        return pickle.loads(data)
+        return load_payload(data_bytes)
     except Exception:
         handle_size_mismatch()
+
+def extract_stream_from_audio(stego_audio_path, chunk_frames=DEFAULT_STREAM_FRAMES, channels=None):
+    """Yield a payload written by embed_stream_into_audio without holding it in memory"""
+    return iter_audio_payload(stego_audio_path, chunk_frames, channels)
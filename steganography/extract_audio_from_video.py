@@ -1,43 +1,90 @@
 import cv2
-import pickle
-import base64
-import numpy as np
 from utils.error_handling import handle_size_mismatch
+from steganography.embed_audio_in_video import VIDEO_HEADER, VIDEO_INDEX, VIDEO_INDEX_MAGIC, video_frame_plan
+from steganography.lsb import BitAccumulator, bits_to_bytes, extract_bits
+from steganography.payload import load_payload
+from steganography.video_writers import open_capture
+
+def _extract_sequential(cap, flat):
+    """Read a payload that starts at frame 0 behind the plain length header"""
+    header_bits = VIDEO_HEADER.size * 8
+    (length,) = VIDEO_HEADER.unpack(bits_to_bytes(extract_bits(flat, 0, header_bits)))
+
+    # Work out how many frames hold the payload before decoding any more
+    end = header_bits + length
+    frames_needed = -(-end // flat.size)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if total_frames > 0 and frames_needed > total_frames:
+        handle_size_mismatch()
+
+    # Collect payload bits frame by frame
+    bits = BitAccumulator()
+    position = 0
+    while True:
+        start = max(header_bits - position, 0)
+        stop = min(end - position, flat.size)
+        bits.append(extract_bits(flat, start, stop - start))
+        position += flat.size
+        if position >= end:
+            break
+        ret, frame = cap.read()
+        if not ret:
+            handle_size_mismatch()
+        flat = frame.reshape(-1)
+    return bits.getvalue()
+
+def _extract_indexed(cap, flat, index):
+    """Seek directly to the frames listed by a VIDEO_INDEX and read only those"""
+    _, start_frame, frame_step, frame_count, bits_per_frame, payload_bits = index
+    try:
+        plan = video_frame_plan(start_frame, frame_step, bits_per_frame, payload_bits, flat.size)
+    except ValueError:
+        handle_size_mismatch()
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if len(plan) != frame_count or (total_frames > 0 and plan[-1][0] >= total_frames):
+        handle_size_mismatch()
+
+    bits = BitAccumulator()
+    position = 1
+    for frame_index, _, local, count in plan:
+        if frame_index != 0:
+            if frame_index != position:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            if not ret:
+                handle_size_mismatch()
+            flat = frame.reshape(-1)
+            position = frame_index + 1
+        bits.append(extract_bits(flat, local, count))
+    return bits.getvalue()
 
 def extract_data_from_video(stego_video_path):
     """
     Extract embedded data from a stego video file using LSB steganography on frames.
+    The length header or frame index is read from the first frame, then only the
+    frames that hold the payload are decoded before the capture is released.
     """
-    cap = cv2.VideoCapture(stego_video_path)
+    cap = open_capture(stego_video_path)
     if not cap.isOpened():
         raise IOError(f"Cannot open video file: {stego_video_path}")
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    # Extract bits
-    bits = []
-    while True:
+    try:
         ret, frame = cap.read()
-        if not ret:
-            break
-        for i in range(height):
-            for j in range(width):
-                for c in range(3):
-                    bits.append(str(int(frame[i, j, c]) & 1))
-    cap.release()
-    bit_str = ''.join(bits)
-    if len(bit_str) < 32:
-        handle_size_mismatch()
-    length = int(bit_str[:32], 2)
-    data_bits = bit_str[32:32 + length]
-    if len(data_bits) < length:
-        handle_size_mismatch()
+        if not ret or frame.size < VIDEO_HEADER.size * 8:
+            handle_size_mismatch()
+        flat = frame.reshape(-1)
+
+        index = None
+        if flat.size >= VIDEO_INDEX.size * 8:
+            index = VIDEO_INDEX.unpack(bits_to_bytes(extract_bits(flat, 0, VIDEO_INDEX.size * 8)))
+        if index is not None and index[0] == VIDEO_INDEX_MAGIC:
+            data_bytes = _extract_indexed(cap, flat, index)
+        else:
+            data_bytes = _extract_sequential(cap, flat)
+    finally:
+        cap.release()
 
-    data_bytes = bytes(int(data_bits[i:i+8], 2) for i in range(0, length, 8))
     try:
-        data_b64 = data_bytes
-        data = base64.b64decode(data_b64)
-        return pickle.loads(data)
+        return load_payload(data_bytes)
     except Exception:
         handle_size_mismatch()
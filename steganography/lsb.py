@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def bytes_to_bits(data):
+    """Unpack a bytes-like object into a uint8 array of 0/1 bits (MSB first)"""
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def bit_range(data, start, stop):
+    """Unpack only bits [start, stop) of data, so the full bit array never exists at once"""
+    bits = bytes_to_bits(data[start // 8:-(-stop // 8)])
+    offset = start - (start // 8) * 8
+    return bits[offset:offset + stop - start]
+
+
+def bits_to_bytes(bits):
+    """Pack a 0/1 bit array (MSB first) back into bytes"""
+    return np.packbits(np.asarray(bits, dtype=np.uint8)).tobytes()
+
+
+def embed_bits(carrier, bits, start=0):
+    """
+    Write bits into the least significant bit of a flat integer carrier view,
+    starting at position start. The carrier is modified in place.
+    """
+    end = start + bits.size
+    target = carrier[start:end]
+    target &= ~np.array(1, dtype=carrier.dtype)
+    target |= bits.astype(carrier.dtype, copy=False)
+    return end
+
+
+def extract_bits(carrier, start=0, count=None):
+    """Read count least significant bits from a flat integer carrier view"""
+    end = None if count is None else start + count
+    return (carrier[start:end] & 1).astype(np.uint8)
+
+
+class BitAccumulator:
+    """Collect bit arrays of any length and pack them into bytes as they arrive"""
+
+    def __init__(self):
+        self._parts = []
+        self._carry = np.empty(0, dtype=np.uint8)
+
+    def append(self, bits):
+        bits = np.concatenate((self._carry, bits))
+        whole = bits.size - bits.size % 8
+        self._parts.append(bits_to_bytes(bits[:whole]))
+        self._carry = bits[whole:]
+
+    def drain(self):
+        """Return the whole bytes collected so far and forget them"""
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+    def getvalue(self):
+        tail = [bits_to_bytes(self._carry)] if self._carry.size else []
+        return b''.join(self._parts + tail)
+
+
+class BitStream:
+    """
+    Hand out the bits of an iterable of byte chunks in sequential runs. Only
+    the bytes a run needs are unpacked, so a large chunk never exists as a
+    whole bit array.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b'')
+        self._bits = np.empty(0, dtype=np.uint8)
+
+    def take(self, count):
+        parts = [self._bits]
+        available = self._bits.size
+        while available < count:
+            if not self._pending:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    raise ValueError("Payload stream ended early")
+                self._pending = memoryview(chunk).cast('B')
+                continue
+            needed = -(-(count - available) // 8)
+            bits = bytes_to_bits(self._pending[:needed])
+            self._pending = self._pending[needed:]
+            parts.append(bits)
+            available += bits.size
+        bits = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        self._bits = bits[count:]
+        return bits[:count]
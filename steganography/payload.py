@@ -0,0 +1,92 @@
+import base64
+import io
+import pickle
+import struct
+import zlib
+
+# Binary container shared by every carrier type:
+#   magic (4) | version (1) | field count (1) | field lengths (4 each) | CRC32 (4) | fields
+# The CRC covers the header and the field bytes, so a wrong key or a damaged
+# carrier is caught before anything is handed to the decryption layer.
+PAYLOAD_MAGIC = b'SSVP'
+PAYLOAD_VERSION = 1
+_HEADER = struct.Struct('>4sBB')
+_LENGTH = struct.Struct('>I')
+_CRC = struct.Struct('>I')
+
+def pack_payload(fields):
+    """Serialize a tuple of bytes-like fields, e.g. (encrypted_aes_key, nonce, tag, ciphertext)"""
+    fields = [memoryview(field).cast('B') for field in fields]
+    if len(fields) > 255:
+        raise ValueError("Too many payload fields")
+    header = _HEADER.pack(PAYLOAD_MAGIC, PAYLOAD_VERSION, len(fields))
+    header += b''.join(_LENGTH.pack(len(field)) for field in fields)
+
+    crc = zlib.crc32(header)
+    for field in fields:
+        crc = zlib.crc32(field, crc)
+
+    out = io.BytesIO()
+    out.write(header)
+    out.write(_CRC.pack(crc))
+    for field in fields:
+        out.write(field)
+    return out.getvalue()
+
+def is_payload(data):
+    """Check whether data starts with the container magic"""
+    return bytes(data[:len(PAYLOAD_MAGIC)]) == PAYLOAD_MAGIC
+
+def unpack_payload(data):
+    """
+    Parse a container and return its fields as memoryview slices of data.
+    Raises ValueError if the container is malformed or fails its CRC.
+    """
+    view = memoryview(data).cast('B')
+    if len(view) < _HEADER.size:
+        raise ValueError("Payload is truncated")
+    magic, version, count = _HEADER.unpack_from(view)
+    if magic != PAYLOAD_MAGIC:
+        raise ValueError("Not a SonicStegnoVault payload")
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported payload version: {version}")
+
+    lengths_end = _HEADER.size + count * _LENGTH.size
+    body = lengths_end + _CRC.size
+    if len(view) < body:
+        raise ValueError("Payload is truncated")
+    lengths = [_LENGTH.unpack_from(view, _HEADER.size + i * _LENGTH.size)[0] for i in range(count)]
+    (expected_crc,) = _CRC.unpack_from(view, lengths_end)
+    if len(view) < body + sum(lengths):
+        raise ValueError("Payload is truncated")
+
+    fields = []
+    offset = body
+    crc = zlib.crc32(view[:lengths_end])
+    for length in lengths:
+        field = view[offset:offset + length]
+        crc = zlib.crc32(field, crc)
+        fields.append(field)
+        offset += length
+    if crc != expected_crc:
+        raise ValueError("Payload CRC mismatch")
+    return tuple(fields)
+
+class _LegacyUnpickler(pickle.Unpickler):
+    """Unpickler for old base64+pickle payloads that refuses to import any global"""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a stego payload")
+
+def load_payload(data):
+    """
+    Decode an extracted payload. New containers are parsed directly; carriers
+    written before the container existed hold a base64-encoded pickled tuple,
+    which is read with an unpickler that only accepts plain data.
+    """
+    if is_payload(data):
+        return unpack_payload(data)
+    fields = _LegacyUnpickler(io.BytesIO(base64.b64decode(bytes(data)))).load()
+    if not isinstance(fields, tuple) or not all(isinstance(field, bytes) for field in fields):
+        raise ValueError("Legacy payload is not a tuple of bytes")
+    return fields
@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+
+# Decode -> embed -> encode pipeline for video frames. OpenCV releases the GIL
+# while decoding and encoding, so running the stages on separate threads keeps
+# all three busy instead of alternating between them on one thread.
+
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+class StageStats:
+    """Frame count and time split for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy, waiting):
+        with self._lock:
+            self.frames += 1
+            self.busy += busy
+            self.waiting += waiting
+
+    def as_dict(self):
+        return {
+            'frames': self.frames,
+            'busy_s': self.busy,
+            'wait_s': self.waiting,
+            'fps': self.frames / self.busy if self.busy else float('inf'),
+        }
+
+class _Aborted(Exception):
+    pass
+
+def _wait(action, failed):
+    """Retry a blocking queue/semaphore call so a failure in another stage is noticed"""
+    while True:
+        if failed.is_set():
+            raise _Aborted()
+        try:
+            return action()
+        except (queue.Empty, queue.Full):
+            continue
+
+def run_video_pipeline(read_frame, process_frame, write_frame, depth=8, workers=1):
+    """
+    Run read_frame() -> process_frame(index, frame) -> write_frame(frame) as a
+    bounded producer/consumer pipeline.
+
+    read_frame returns the next frame or None at the end of the stream. At most
+    depth frames are in flight at once, whatever the number of process workers,
+    and frames always reach write_frame in the order they were read.
+    Returns per-stage statistics keyed by 'decode', 'embed' and 'encode'.
+    """
+    if depth < 1 or workers < 1:
+        raise ValueError("Pipeline depth and worker count must be at least 1")
+    decoded = queue.Queue(depth)
+    processed = queue.Queue(depth)
+    slots = threading.Semaphore(depth)
+    failed = threading.Event()
+    errors = []
+    stats = {name: StageStats(name) for name in ('decode', 'embed', 'encode')}
+
+    def put(q, item):
+        _wait(lambda: q.put(item, timeout=_POLL_SECONDS), failed)
+
+    def get(q):
+        return _wait(lambda: q.get(timeout=_POLL_SECONDS), failed)
+
+    def acquire_slot():
+        def action():
+            if not slots.acquire(timeout=_POLL_SECONDS):
+                raise queue.Full()
+        _wait(action, failed)
+
+    def fail(exc):
+        if not isinstance(exc, _Aborted):
+            errors.append(exc)
+        failed.set()
+
+    def decode():
+        try:
+            index = 0
+            while True:
+                started = time.perf_counter()
+                acquire_slot()
+                ready = time.perf_counter()
+                frame = read_frame()
+                if frame is None:
+                    break
+                stats['decode'].add(time.perf_counter() - ready, ready - started)
+                put(decoded, (index, frame))
+                index += 1
+            for _ in range(workers):
+                put(decoded, _DONE)
+        except BaseException as exc:
+            fail(exc)
+
+    def embed():
+        try:
+            while True:
+                started = time.perf_counter()
+                item = get(decoded)
+                if item is _DONE:
+                    put(processed, _DONE)
+                    return
+                ready = time.perf_counter()
+                index, frame = item
+                frame = process_frame(index, frame)
+                stats['embed'].add(time.perf_counter() - ready, ready - started)
+                put(processed, (index, frame))
+        except BaseException as exc:
+            fail(exc)
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=embed, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    # Encode on the calling thread, holding out-of-order frames until their turn
+    try:
+        pending = {}
+        next_index = 0
+        finished = 0
+        while finished < workers:
+            started = time.perf_counter()
+            item = get(processed)
+            if item is _DONE:
+                finished += 1
+                continue
+            pending[item[0]] = item[1]
+            while next_index in pending:
+                ready = time.perf_counter()
+                write_frame(pending.pop(next_index))
+                stats['encode'].add(time.perf_counter() - ready, ready - started)
+                started = time.perf_counter()
+                next_index += 1
+                slots.release()
+    except BaseException as exc:
+        fail(exc)
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return {name: stage.as_dict() for name, stage in stats.items()}
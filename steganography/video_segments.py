@@ -0,0 +1,254 @@
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from utils.error_handling import handle_size_mismatch
+from steganography.avi_concat import concat_avi
+from steganography.embed_audio_in_video import (VIDEO_HEADER, VIDEO_INDEX, VIDEO_INDEX_MAGIC, embed_data_into_video,
+                                                video_frame_plan)
+from steganography.lsb import BitAccumulator, bit_range, bits_to_bytes, embed_bits, extract_bits
+from steganography.payload import pack_payload, load_payload
+from steganography.video_writers import (PROFILES, FrameSequenceWriter, open_capture, open_writer, output_extension,
+                                         select_profile)
+
+# Segment-parallel video embedding. The cover is split into frame ranges that
+# each start on a byte boundary of the payload bit stream, so every worker
+# process gets a plain byte slice of the payload and needs no shared state.
+# Workers write the final output directly: frame sequences at their global
+# frame numbers, AVI files as segments in the output profile that are then
+# joined by copying the compressed frames. No frame is encoded twice.
+
+_SEGMENT_EXT = '.avi'
+# Pipeline depth for outputs that cannot be joined without re-encoding
+_FALLBACK_PIPELINE_DEPTH = 8
+
+def _video_properties(video_path):
+    cap = open_capture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, width, height, frame_count
+
+def split_segments(frame_count, frame_bits, segments):
+    """
+    Split frames [0, frame_count) into at most segments ranges whose first
+    payload bit falls on a byte boundary.
+    """
+    align = 8 // math.gcd(frame_bits, 8)
+    size = -(-frame_count // max(segments, 1))
+    size = -(-size // align) * align
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+def _embed_segment(cover_video_path, segment_path, segment_profile, first, last, payload, frame_bits, fps, size):
+    """
+    Worker: embed payload (the bytes starting at bit first * frame_bits) into
+    frames [first, last). Frame sequences are written straight into
+    segment_path under their global frame numbers.
+    """
+    cap = open_capture(cover_video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    if PROFILES[segment_profile].fourcc is None:
+        out = FrameSequenceWriter(segment_path, first)
+    else:
+        out = open_writer(segment_path, segment_profile, fps, size)
+    total_bits = len(payload) * 8
+    written = 0
+    try:
+        for index in range(last - first):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            start = index * frame_bits
+            if start < total_bits:
+                flat = frame.reshape(-1)
+                stop = min(total_bits, start + flat.size)
+                embed_bits(flat, bit_range(payload, start, stop))
+            out.write(frame)
+            written += 1
+    finally:
+        cap.release()
+        out.release()
+    return written
+
+def _extract_segment(stego_video_path, first, last, count):
+    """Worker: read the first count LSBs of frames [first, last) and pack them into bytes"""
+    cap = open_capture(stego_video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    parts = []
+    try:
+        for _ in range(last - first):
+            if count <= 0:
+                break
+            ret, frame = cap.read()
+            if not ret:
+                break
+            flat = frame.reshape(-1)
+            bits = extract_bits(flat, 0, min(count, flat.size))
+            count -= bits.size
+            parts.append(bits)
+    finally:
+        cap.release()
+    return bits_to_bytes(np.concatenate(parts)) if parts else b''
+
+def _extract_planned_frames(stego_video_path, entries):
+    """Worker: read the (frame, payload offset, local offset, count) entries of an indexed payload"""
+    cap = open_capture(stego_video_path)
+    bits = BitAccumulator()
+    position = None
+    try:
+        for frame_index, _, local, count in entries:
+            if frame_index != position:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position = frame_index + 1
+            bits.append(extract_bits(frame.reshape(-1), local, count))
+    finally:
+        cap.release()
+    return bits.getvalue()
+
+def _extract_indexed_parallel(stego_video_path, index, frame_bits, frame_count, processes):
+    _, start_frame, frame_step, used_frames, bits_per_frame, payload_bits = index
+    try:
+        plan = video_frame_plan(start_frame, frame_step, bits_per_frame, payload_bits, frame_bits)
+    except ValueError:
+        handle_size_mismatch()
+    if len(plan) != used_frames or (frame_count > 0 and plan[-1][0] >= frame_count):
+        handle_size_mismatch()
+
+    # Group frames so that every group starts on a byte boundary of the payload
+    workers = processes or os.cpu_count() or 1
+    groups = []
+    target = -(-len(plan) // workers)
+    current = []
+    for entry in plan:
+        if len(current) >= target and entry[1] % 8 == 0:
+            groups.append(current)
+            current = []
+        current.append(entry)
+    groups.append(current)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_extract_planned_frames, stego_video_path, group) for group in groups]
+        return b''.join(future.result() for future in futures)
+
+def _join_by_reencoding(paths, output_path, profile, fps, size):
+    out = open_writer(output_path, profile, fps, size)
+    try:
+        for path in paths:
+            cap = open_capture(path)
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                out.write(frame)
+            cap.release()
+    finally:
+        out.release()
+
+def embed_data_into_video_parallel(cover_video_path, data_tuple, output_path, processes=None, profile=None):
+    """
+    Embed data into a cover video like embed_data_into_video, splitting the
+    cover into frame-range segments that are embedded and encoded
+    concurrently in a process pool. profile selects the output writer as in
+    embed_data_into_video.
+
+    Only frame sequences and AVI outputs can be assembled from independently
+    encoded pieces; other containers are written by the pipelined
+    single-pass embedder, which is faster than segmenting and re-encoding.
+    """
+    data = pack_payload(data_tuple)
+    full = VIDEO_HEADER.pack(len(data) * 8) + data
+    total_bits = len(full) * 8
+
+    fps, width, height, frame_count = _video_properties(cover_video_path)
+    frame_bits = width * height * 3
+    if total_bits > frame_count * frame_bits:
+        handle_size_mismatch()
+
+    profile = profile or select_profile(output_path, (width, height))
+    sequence = PROFILES[profile].fourcc is None
+    if not sequence and output_extension(output_path) != _SEGMENT_EXT:
+        embed_data_into_video(cover_video_path, data_tuple, output_path,
+                              pipeline_depth=_FALLBACK_PIPELINE_DEPTH, profile=profile)
+        return
+
+    segments = split_segments(frame_count, frame_bits, processes or os.cpu_count() or 1)
+    # Segments go next to the output so the join reads from the same filesystem
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        if sequence:
+            paths = [output_path] * len(segments)
+        else:
+            paths = [os.path.join(tmp, f"segment_{i:05d}{_SEGMENT_EXT}") for i in range(len(segments))]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = []
+            for path, (first, last) in zip(paths, segments):
+                share = full[first * frame_bits // 8:-(-last * frame_bits // 8)]
+                futures.append(pool.submit(_embed_segment, cover_video_path, path, profile, first, last,
+                                           share, frame_bits, fps, (width, height)))
+            frames_written = sum(future.result() for future in futures)
+        if frames_written * frame_bits < total_bits:
+            handle_size_mismatch()
+        if sequence:
+            return
+
+        try:
+            concat_avi(paths, output_path)
+        except ValueError:
+            # Segments the stream copy cannot handle (e.g. past the AVI 1.0 size limit)
+            _join_by_reencoding(paths, output_path, profile, fps, (width, height))
+
+def extract_data_from_video_parallel(stego_video_path, processes=None):
+    """
+    Extract data embedded by either video embedder, reading the frames that
+    hold the payload concurrently in a process pool. Indexed payloads are read
+    by seeking straight to the frames listed in the index.
+    """
+    cap = open_capture(stego_video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file: {stego_video_path}")
+    header_bits = VIDEO_HEADER.size * 8
+    ret, frame = cap.read()
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    if not ret or frame.size < header_bits:
+        handle_size_mismatch()
+    frame_bits = frame.size
+
+    if frame_bits >= VIDEO_INDEX.size * 8:
+        index = VIDEO_INDEX.unpack(bits_to_bytes(extract_bits(frame.reshape(-1), 0, VIDEO_INDEX.size * 8)))
+        if index[0] == VIDEO_INDEX_MAGIC:
+            data_bytes = _extract_indexed_parallel(stego_video_path, index, frame_bits, frame_count, processes)
+            try:
+                return load_payload(data_bytes)
+            except Exception:
+                handle_size_mismatch()
+
+    (length,) = VIDEO_HEADER.unpack(bits_to_bytes(extract_bits(frame.reshape(-1), 0, header_bits)))
+    end = header_bits + length
+    frames_needed = -(-end // frame_bits)
+    if frame_count > 0 and frames_needed > frame_count:
+        handle_size_mismatch()
+
+    segments = split_segments(frames_needed, frame_bits, processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = []
+        for first, last in segments:
+            start = first * frame_bits
+            count = min(last * frame_bits, end) - start
+            futures.append(pool.submit(_extract_segment, stego_video_path, first, last, count))
+        full = b''.join(future.result() for future in futures)
+
+    data_bytes = full[VIDEO_HEADER.size:]
+    try:
+        return load_payload(data_bytes)
+    except Exception:
+        handle_size_mismatch()
@@ -0,0 +1,202 @@
+import os
+import tempfile
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Output profiles for stego video. LSB data only survives a lossless codec, so
+# every profile is verified with a round-trip probe on the local OpenCV build
+# before it is used. By default the lossless profile with the lowest cost per
+# frame at the cover's resolution is picked, counting both encode time and the
+# bytes it writes.
+
+# auto: whether select_profile may pick the profile without being asked
+VideoProfile = namedtuple('VideoProfile', ['name', 'fourcc', 'lossless', 'auto'])
+
+PROFILES = {
+    'ffv1': VideoProfile('ffv1', 'FFV1', True, True),
+    'huffyuv': VideoProfile('huffyuv', 'HFYU', True, True),
+    'png': VideoProfile('png', 'MPNG', True, True),
+    # Uncompressed; only used when asked for, since it writes 4 bytes per pixel
+    'raw': VideoProfile('raw', 'RGBA', True, False),
+    # One PNG file per frame in a directory; output_path names the directory
+    'png-sequence': VideoProfile('png-sequence', None, True, True),
+    # Lossy MPEG-4, kept for callers that only need a playable file
+    'mp4v': VideoProfile('mp4v', 'mp4v', False, False),
+}
+
+SEQUENCE_PATTERN = 'frame_%06d.png'
+
+_PROBE_SIZE = (64, 48)
+_PROBE_FRAMES = 4
+_BENCHMARK_SIZE = (320, 240)
+_BENCHMARK_FRAMES = 10
+# Cap on benchmark pixels so large covers are measured on fewer frames
+_BENCHMARK_PIXELS = 10 * 640 * 480
+# Sustained write rate used to price output bytes; a page-cached temp file
+# would otherwise make every byte look free
+WRITE_BYTES_PER_SECOND = 200 * 1024 * 1024
+
+class FrameSequenceWriter:
+    """VideoWriter lookalike that stores each frame as a numbered PNG"""
+
+    def __init__(self, directory, start=0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index = start
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        path = os.path.join(self.directory, SEQUENCE_PATTERN % self.index)
+        if not cv2.imwrite(path, frame, [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+            raise IOError(f"Cannot write frame: {path}")
+        self.index += 1
+
+    def release(self):
+        pass
+
+def open_writer(output_path, profile, fps, size):
+    """Open a writer for the named profile, raising IOError if the backend rejects it"""
+    profile = PROFILES[profile]
+    if profile.fourcc is None:
+        return FrameSequenceWriter(output_path)
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*profile.fourcc), fps, size)
+    if not writer.isOpened():
+        raise IOError(f"Cannot open {profile.name} writer for {output_path}")
+    return writer
+
+def open_capture(video_path):
+    """Open a video file, or a directory written by the png-sequence profile"""
+    if os.path.isdir(video_path):
+        return cv2.VideoCapture(os.path.join(video_path, SEQUENCE_PATTERN), cv2.CAP_IMAGES)
+    return cv2.VideoCapture(video_path)
+
+def _random_frames(size, count):
+    rng = np.random.default_rng(0)
+    width, height = size
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+def _natural_frames(size, count):
+    """Moving gradients with sensor-like noise, compressing roughly like camera footage"""
+    rng = np.random.default_rng(0)
+    width, height = size
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frames = []
+    for i in range(count):
+        base = np.stack([(x + 4 * i) % 256 + 0 * y, (y + 2 * i) % 256 + 0 * x, (x + y) / 2 + 0 * x], axis=2)
+        noise = rng.normal(0, 2, (height, width, 3))
+        frames.append(np.clip(base + noise, 0, 255).astype(np.uint8))
+    return frames
+
+def _output_bytes(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    return os.path.getsize(path)
+
+def _write_and_read(profile, extension, frames, size):
+    """
+    Write frames with a profile and read them back; returns (seconds spent
+    writing, bytes written, frames read)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'probe' + extension)
+        try:
+            writer = open_writer(path, profile, 10, size)
+        except (IOError, cv2.error):
+            return None, 0, []
+        started = time.perf_counter()
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+        elapsed = time.perf_counter() - started
+        written = _output_bytes(path)
+
+        cap = open_capture(path)
+        decoded = []
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded.append(frame)
+        cap.release()
+    return elapsed, written, decoded
+
+def probe_profile(profile, extension='.avi'):
+    """Check that a profile writes and reads back frames bit-exactly in the given container"""
+    frames = _random_frames(_PROBE_SIZE, _PROBE_FRAMES)
+    _, _, decoded = _write_and_read(profile, '' if PROFILES[profile].fourcc is None else extension, frames, _PROBE_SIZE)
+    return len(decoded) == len(frames) and all(np.array_equal(a, b) for a, b in zip(frames, decoded))
+
+def benchmark_profile(profile, extension='.avi', size=_BENCHMARK_SIZE, frames=None):
+    """
+    Write natural-looking frames of the given size and return (frames per
+    second, output bytes per frame), or None if the profile is unavailable
+    """
+    frames = frames or max(2, min(_BENCHMARK_FRAMES, _BENCHMARK_PIXELS // (size[0] * size[1])))
+    elapsed, written, decoded = _write_and_read(profile, '' if PROFILES[profile].fourcc is None else extension,
+                                                _natural_frames(size, frames), size)
+    if not decoded:
+        return None
+    return (frames / elapsed if elapsed else float('inf')), written / frames
+
+def frame_cost(fps, bytes_per_frame):
+    """Seconds per frame: encode time plus the time to write its output bytes"""
+    return 1 / fps + bytes_per_frame / WRITE_BYTES_PER_SECOND
+
+def output_extension(output_path):
+    return os.path.splitext(output_path)[1].lower()
+
+@lru_cache(maxsize=None)
+def _cheapest_lossless(extension, size):
+    candidates = [name for name, profile in PROFILES.items()
+                  if profile.lossless and profile.auto and (profile.fourcc is None) == (extension == '')]
+    best, best_cost = None, float('inf')
+    for name in candidates:
+        if not probe_profile(name, extension):
+            continue
+        result = benchmark_profile(name, extension, size)
+        if result and frame_cost(*result) < best_cost:
+            best, best_cost = name, frame_cost(*result)
+    return best
+
+def select_profile(output_path, size=_BENCHMARK_SIZE):
+    """
+    Pick the lossless profile for output_path's container with the lowest
+    frame_cost at size (the cover's (width, height)); a path without an
+    extension selects the PNG frame sequence. Profiles not marked auto, such
+    as raw, are never picked here. Results are cached per container and size
+    for the life of the process.
+    """
+    extension = output_extension(output_path)
+    profile = _cheapest_lossless(extension, tuple(size))
+    if profile is None:
+        raise IOError(f"No lossless video writer is available for '{extension or 'directory'}' outputs")
+    return profile
+
+def main():
+    for extension in ('.avi', '.mkv', '.mp4', ''):
+        print(f"Container: {extension or 'directory'}")
+        for name, profile in PROFILES.items():
+            if (profile.fourcc is None) != (extension == ''):
+                continue
+            result = benchmark_profile(name, extension)
+            if result is None:
+                print(f"  {name:14s} unavailable")
+                continue
+            fps, bytes_per_frame = result
+            lossless = probe_profile(name, extension)
+            print(f"  {name:14s} {fps:8.1f} fps  {bytes_per_frame / 1024:8.1f} KiB/frame  "
+                  f"{frame_cost(fps, bytes_per_frame) * 1000:7.2f} ms/frame  {'lossless' if lossless else 'lossy'}")
+        try:
+            print(f"  default: {select_profile('output' + extension)}")
+        except IOError as e:
+            print(f"  default: none ({e})")
+
+if __name__ == "__main__":
+    main()
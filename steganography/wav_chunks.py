@@ -0,0 +1,82 @@
+import os
+import shutil
+import struct
+from collections import namedtuple
+
+# Location and format of the sample data inside a RIFF/WAVE file
+WavLayout = namedtuple('WavLayout', ['format_tag', 'channels', 'framerate', 'sampwidth', 'data_offset', 'data_size'])
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Sample widths in bytes that can carry LSB data for each format
+SUPPORTED_SAMPWIDTHS = {
+    WAVE_FORMAT_PCM: (1, 2, 3, 4),
+    WAVE_FORMAT_IEEE_FLOAT: (4, 8),
+}
+
+_CHUNK = struct.Struct('<4sI')
+_FMT = struct.Struct('<HHIIHH')
+# cbSize, valid bits, channel mask, then the first two bytes of the SubFormat GUID
+_FMT_EXTENSIBLE = struct.Struct('<HHIH')
+
+# Linux ioctl that clones a file's extents on copy-on-write filesystems (btrfs, XFS)
+_FICLONE = 0x40049409
+
+def _parse_fmt(raw):
+    """Return the fmt chunk fields, resolving WAVE_FORMAT_EXTENSIBLE to its SubFormat tag"""
+    format_tag, channels, framerate, _, _, bits = _FMT.unpack_from(raw)
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(raw) >= _FMT.size + _FMT_EXTENSIBLE.size:
+        format_tag = _FMT_EXTENSIBLE.unpack_from(raw, _FMT.size)[3]
+    return format_tag, channels, framerate, bits
+
+def parse_wav_layout(f, name='WAV data'):
+    """Walk the RIFF chunks of an open binary file and return the fmt fields and data chunk position"""
+    riff, _, wave_id = struct.unpack('<4sI4s', f.read(12).ljust(12, b'\0'))
+    if riff != b'RIFF' or wave_id != b'WAVE':
+        raise ValueError(f"Not a RIFF/WAVE file: {name}")
+    fmt = None
+    while True:
+        header = f.read(_CHUNK.size)
+        if len(header) < _CHUNK.size:
+            raise ValueError(f"No data chunk found in {name}")
+        chunk_id, size = _CHUNK.unpack(header)
+        if chunk_id == b'fmt ':
+            fmt = _parse_fmt(f.read(size))
+            f.seek(size & 1, os.SEEK_CUR)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError(f"data chunk precedes fmt chunk in {name}")
+            format_tag, channels, framerate, bits = fmt
+            return WavLayout(format_tag, channels, framerate, (bits + 7) // 8, f.tell(), size)
+        else:
+            # Chunks are padded to an even number of bytes
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+def read_wav_layout(path):
+    """Return the layout of a WAV file on disk"""
+    with open(path, 'rb') as f:
+        return parse_wav_layout(f, path)
+
+def check_sample_format(layout):
+    """Raise ValueError unless the samples are PCM or IEEE float of a supported width"""
+    widths = SUPPORTED_SAMPWIDTHS.get(layout.format_tag)
+    if widths is None:
+        raise ValueError(f"Unsupported WAV format tag: {layout.format_tag:#06x}")
+    if layout.sampwidth not in widths:
+        raise ValueError(f"Unsupported sample width for format {layout.format_tag:#06x}: {layout.sampwidth * 8} bits")
+
+def clone_file(src, dst):
+    """
+    Copy src to dst as cheaply as the filesystem allows: a reflink where
+    supported, otherwise the kernel-side copy used by shutil.copyfile.
+    """
+    try:
+        import fcntl
+        with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+            fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(src, dst)
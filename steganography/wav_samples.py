@@ -0,0 +1,54 @@
+import numpy as np
+from steganography.lsb import embed_bits, extract_bits
+
+# WAV samples are little-endian, so the least significant bit of every PCM
+# width (8/16/24/32-bit) and of IEEE float mantissas lives in the first byte
+# of the sample. Working on a strided uint8 view of those bytes handles every
+# supported format without unpacking 24-bit samples or copying the buffer.
+
+def sample_lsb_view(buffer, layout):
+    """Return a (frames, channels) uint8 view of the low byte of each sample in buffer"""
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    block_align = layout.channels * layout.sampwidth
+    frames = raw.size // block_align
+    return raw[:frames * block_align].reshape(frames, layout.channels, layout.sampwidth)[:, :, 0]
+
+def carrier_channels(layout, channels=None):
+    """Validate a channel selection; None means every channel carries bits, in frame order"""
+    if channels is None:
+        return None
+    channels = sorted(set(channels))
+    if not channels or channels[0] < 0 or channels[-1] >= layout.channels:
+        raise ValueError(f"Channel selection {channels} does not fit a {layout.channels}-channel carrier")
+    if len(channels) == layout.channels:
+        return None
+    return channels
+
+def bits_per_frame(layout, channels=None):
+    return layout.channels if channels is None else len(channels)
+
+def _frame_block(lsb, start, count, channels):
+    """Select the frames holding bits [start, start + count) and the bit offset into them"""
+    k = lsb.shape[1] if channels is None else len(channels)
+    first = start // k
+    last = -(-(start + count) // k)
+    block = lsb[first:last] if channels is None else lsb[first:last, channels]
+    return block, first, last, start - first * k
+
+def write_lsb_bits(lsb, bits, start=0, channels=None):
+    """
+    Write bits into the sample LSBs of a writable lsb view, bit i going to
+    frame i // k of the k selected channels.
+    """
+    block, first, last, offset = _frame_block(lsb, start, bits.size, channels)
+    flat = block.reshape(-1)
+    embed_bits(flat, bits, offset)
+    if channels is not None:
+        lsb[first:last, channels] = flat.reshape(block.shape)
+    elif not np.shares_memory(flat, lsb):
+        lsb[first:last] = flat.reshape(block.shape)
+
+def read_lsb_bits(lsb, start, count, channels=None):
+    """Read count sample LSBs starting at bit start, using the same layout as write_lsb_bits"""
+    block, _, _, offset = _frame_block(lsb, start, count, channels)
+    return extract_bits(block.reshape(-1), offset, count)
@@ -0,0 +1,102 @@
+from functools import cached_property
+
+import numpy as np
+import librosa
+
+# Memory an analysis may use before derived spectra stop being memoized
+DEFAULT_CACHE_LIMIT = 256 * 1024 * 1024
+
+class AudioAnalysis:
+    """
+    Spectral representations of one signal, computed on first use and then
+    shared by every feature and plot function. The parameters match librosa's
+    defaults, so results are identical to calling the librosa features on y.
+
+    The complex STFT is not kept, since only the magnitude is derived from
+    it. The power spectrogram is memoized while the analysis stays within
+    cache_limit bytes; for longer signals it is derived from the magnitude
+    on each access instead.
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, n_fft: int = 2048, hop_length: int = 512,
+                 cache_limit: int = DEFAULT_CACHE_LIMIT):
+        self.y = y
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.cache_limit = cache_limit
+
+    @property
+    def stft(self) -> np.ndarray:
+        """Complex STFT, recomputed on every access"""
+        return librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
+
+    @cached_property
+    def magnitude(self) -> np.ndarray:
+        return np.abs(self.stft)
+
+    @property
+    def power(self) -> np.ndarray:
+        """Power spectrogram, memoized when it fits within cache_limit"""
+        power = vars(self).get('_power')
+        if power is None:
+            power = self.magnitude ** 2
+            if self.nbytes + power.nbytes <= self.cache_limit:
+                self._power = power
+        return power
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the signal and every representation computed so far"""
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    @cached_property
+    def mel(self) -> np.ndarray:
+        """Mel power spectrogram"""
+        return librosa.feature.melspectrogram(S=self.power, sr=self.sr)
+
+    @cached_property
+    def mel_db(self) -> np.ndarray:
+        return librosa.power_to_db(self.mel)
+
+    @cached_property
+    def times(self) -> np.ndarray:
+        return librosa.times_like(self.magnitude, sr=self.sr, hop_length=self.hop_length)
+
+    @cached_property
+    def frequencies(self) -> np.ndarray:
+        return librosa.fft_frequencies(sr=self.sr, n_fft=self.n_fft)
+
+    @cached_property
+    def spectral_centroid(self) -> np.ndarray:
+        return librosa.feature.spectral_centroid(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)[0]
+
+    @cached_property
+    def spectral_bandwidth(self) -> np.ndarray:
+        return librosa.feature.spectral_bandwidth(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)[0]
+
+    @cached_property
+    def spectral_rolloff(self) -> np.ndarray:
+        return librosa.feature.spectral_rolloff(S=self.magnitude, sr=self.sr, n_fft=self.n_fft)[0]
+
+    @cached_property
+    def chroma(self) -> np.ndarray:
+        return librosa.feature.chroma_stft(S=self.power, sr=self.sr, n_fft=self.n_fft)
+
+    @cached_property
+    def rms(self) -> np.ndarray:
+        return librosa.feature.rms(S=self.magnitude, frame_length=self.n_fft)[0]
+
+    def mfcc(self, n_mfcc: int = 13) -> np.ndarray:
+        return librosa.feature.mfcc(S=self.mel_db, sr=self.sr, n_mfcc=n_mfcc)
+
+    @cached_property
+    def onset_envelope(self) -> np.ndarray:
+        """Onset strength as computed inside librosa.beat.beat_track"""
+        return librosa.onset.onset_strength(S=self.mel_db, sr=self.sr, aggregate=np.median)
+
+def get_analysis(y, sr, analysis=None) -> AudioAnalysis:
+    """Reuse analysis when it was built for this signal, otherwise start a new one"""
+    if analysis is not None and analysis.y is y and analysis.sr == sr:
+        return analysis
+    return AudioAnalysis(y, sr)
@@ -1,54 +1,126 @@
+import time
 import numpy as np
 import librosa
-from typing import Dict, Any
+from collections.abc import Mapping
+from typing import Dict, Any, Optional, Iterable
+from utils.audio_analysis import AudioAnalysis, get_analysis
 
-def get_audio_features(y: np.ndarray, sr: int) -> Dict[str, Any]:
-    """Extract comprehensive audio features"""
-    if len(y) == 0:
-        raise ValueError("Empty audio signal")
-        
+# Features are grouped in tiers by cost: basic ones are simple reductions over
+# the samples, spectral ones need the STFT, and the rhythm/tonal tier runs beat
+# tracking, the mel bank and chroma, which dominate the time on long clips.
+FEATURE_TIERS = ('basic', 'spectral', 'rhythm')
+
+_N_MFCC = 13
+
+def _basic_features(y, sr, analysis):
     features = {}
-    
-    # Basic features
     features['Duration (s)'] = len(y) / sr
     features['Sample Rate'] = sr
     features['Number of Samples'] = len(y)
-    
+
     # Amplitude features
     features['Peak Amplitude'] = float(np.max(np.abs(y)))
     features['RMS Energy'] = float(np.sqrt(np.mean(y**2)))
     features['Dynamic Range (dB)'] = float(20 * np.log10(np.max(np.abs(y)) / (np.min(np.abs(y[y != 0])) + 1e-6)))
-    
-    # Spectral features
-    spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    features['Mean Spectral Centroid'] = float(np.mean(spectral_centroids))
-    features['Std Spectral Centroid'] = float(np.std(spectral_centroids))
-    
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-    features['Mean Spectral Rolloff'] = float(np.mean(spectral_rolloff))
-    
-    spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-    features['Mean Spectral Bandwidth'] = float(np.mean(spectral_bandwidth))
-    
+
     # Temporal features
     zero_crossings = librosa.zero_crossings(y)
-    features['Zero Crossing Rate'] = float(sum(zero_crossings) / len(y))
-    
-    # Rhythm features
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    features['Tempo (BPM)'] = float(tempo)
-    
-    # MFCCs
-    mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    for i in range(13):
+    features['Zero Crossing Rate'] = float(np.count_nonzero(zero_crossings) / len(y))
+    return features
+
+def _spectral_features(y, sr, analysis):
+    features = {}
+    spectral_centroids = analysis.spectral_centroid
+    features['Mean Spectral Centroid'] = float(np.mean(spectral_centroids))
+    features['Std Spectral Centroid'] = float(np.std(spectral_centroids))
+    features['Mean Spectral Rolloff'] = float(np.mean(analysis.spectral_rolloff))
+    features['Mean Spectral Bandwidth'] = float(np.mean(analysis.spectral_bandwidth))
+    return features
+
+def _rhythm_features(y, sr, analysis):
+    features = {}
+    tempo, _ = librosa.beat.beat_track(onset_envelope=analysis.onset_envelope, sr=sr)
+    features['Tempo (BPM)'] = float(np.atleast_1d(tempo)[0])
+
+    mfccs = analysis.mfcc(n_mfcc=_N_MFCC)
+    for i in range(_N_MFCC):
         features[f'MFCC_{i+1}'] = float(np.mean(mfccs[i]))
-    
-    # Chroma features
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-    features['Mean Chroma Energy'] = float(np.mean(chroma))
-    
+
+    features['Mean Chroma Energy'] = float(np.mean(analysis.chroma))
     return features
 
+_TIER_FUNCTIONS = {
+    'basic': _basic_features,
+    'spectral': _spectral_features,
+    'rhythm': _rhythm_features,
+}
+
+# Feature names of each tier, so a lookup knows which tier to compute
+_TIER_KEYS = {
+    'basic': ('Duration (s)', 'Sample Rate', 'Number of Samples', 'Peak Amplitude', 'RMS Energy',
+              'Dynamic Range (dB)', 'Zero Crossing Rate'),
+    'spectral': ('Mean Spectral Centroid', 'Std Spectral Centroid', 'Mean Spectral Rolloff', 'Mean Spectral Bandwidth'),
+    'rhythm': ('Tempo (BPM)',) + tuple(f'MFCC_{i+1}' for i in range(_N_MFCC)) + ('Mean Chroma Energy',),
+}
+_KEY_TIERS = {key: tier for tier, keys in _TIER_KEYS.items() for key in keys}
+
+class AudioFeatures(Mapping):
+    """
+    Read-only mapping of feature name to value that computes a tier the first
+    time one of its features is read. timings holds the seconds each computed
+    tier took.
+    """
+
+    def __init__(self, y: np.ndarray, sr: int, analysis: Optional[AudioAnalysis] = None,
+                 tiers: Iterable[str] = FEATURE_TIERS):
+        if len(y) == 0:
+            raise ValueError("Empty audio signal")
+        tiers = tuple(tiers)
+        unknown = set(tiers) - set(FEATURE_TIERS)
+        if unknown:
+            raise ValueError(f"Unknown feature tiers: {sorted(unknown)}")
+        self.y = y
+        self.sr = sr
+        self.analysis = get_analysis(y, sr, analysis)
+        self.tiers = tuple(tier for tier in FEATURE_TIERS if tier in tiers)
+        self.timings: Dict[str, float] = {}
+        self._values: Dict[str, Dict[str, Any]] = {}
+
+    def tier(self, name: str) -> Dict[str, Any]:
+        """Compute (once) and return the features of one tier"""
+        if name not in self.tiers:
+            raise KeyError(f"Feature tier not selected: {name}")
+        if name not in self._values:
+            started = time.perf_counter()
+            self._values[name] = _TIER_FUNCTIONS[name](self.y, self.sr, self.analysis)
+            self.timings[name] = time.perf_counter() - started
+        return self._values[name]
+
+    def computed(self) -> Dict[str, Any]:
+        """Features of the tiers computed so far, without computing more"""
+        return {key: value for tier in self.tiers if tier in self._values for key, value in self._values[tier].items()}
+
+    def __getitem__(self, key):
+        tier = _KEY_TIERS.get(key)
+        if tier not in self.tiers:
+            raise KeyError(key)
+        return self.tier(tier)[key]
+
+    def __iter__(self):
+        for tier in self.tiers:
+            yield from _TIER_KEYS[tier]
+
+    def __len__(self):
+        return sum(len(_TIER_KEYS[tier]) for tier in self.tiers)
+
+def get_audio_features(y: np.ndarray, sr: int, analysis: Optional[AudioAnalysis] = None,
+                       tiers: Iterable[str] = FEATURE_TIERS) -> Dict[str, Any]:
+    """Extract the audio features of the selected tiers, reusing the spectra in analysis when given"""
+    features = AudioFeatures(y, sr, analysis, tiers)
+    for tier in features.tiers:
+        features.tier(tier)
+    return features.computed()
+
 def get_audio_statistics(y: np.ndarray) -> Dict[str, float]:
     """Calculate statistical features of audio signal"""
     return {
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Level-of-detail helpers for charts. A plot never needs more points than it
+# has pixels, so long signals are reduced to a fixed budget before they are
+# serialized to Plotly: waveforms to a min/max envelope (peaks stay visible,
+# unlike plain decimation) and spectrogram-like matrices to max-pooled bins.
+
+DEFAULT_WIDTH = 1200
+DEFAULT_HEIGHT = 256
+
+def _bin_edges(length, bins):
+    """Start indices of at most bins near-equal runs covering range(length)"""
+    if length <= bins:
+        return np.arange(length)
+    return np.unique(np.linspace(0, length, bins + 1).astype(np.int64)[:-1])
+
+def minmax_envelope(y, sr, width=DEFAULT_WIDTH):
+    """
+    Reduce a signal to at most 2 * width points: the minimum and maximum of
+    each of width buckets, interleaved so one line trace draws the envelope.
+    Returns (times, values); short signals come back unchanged.
+    """
+    y = np.asarray(y)
+    if len(y) <= 2 * width:
+        return np.arange(len(y)) / sr, y
+    starts = _bin_edges(len(y), width)
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    times = np.repeat(starts / sr, 2)
+    values = np.empty(2 * len(starts), dtype=y.dtype)
+    values[0::2] = mins
+    values[1::2] = maxs
+    return times, values
+
+def bin_matrix(z, x=None, y=None, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+    """
+    Max-pool a (rows, columns) matrix to at most height x width cells, with
+    the matching x (column) and y (row) coordinates taken at each bin start.
+    Returns (z, x, y); coordinates left as None stay None.
+    """
+    z = np.asarray(z)
+    cols = _bin_edges(z.shape[1], width)
+    rows = _bin_edges(z.shape[0], height)
+    if len(cols) < z.shape[1]:
+        z = np.maximum.reduceat(z, cols, axis=1)
+        x = None if x is None else np.asarray(x)[cols]
+    if len(rows) < z.shape[0]:
+        z = np.maximum.reduceat(z, rows, axis=0)
+        y = None if y is None else np.asarray(y)[rows]
+    return z, x, y
+
+def bin_series(values, times, width=DEFAULT_WIDTH):
+    """Average a per-frame series down to at most width points"""
+    values = np.asarray(values)
+    if len(values) <= width:
+        return values, times
+    starts = _bin_edges(len(values), width)
+    counts = np.diff(np.append(starts, len(values)))
+    return np.add.reduceat(values, starts) / counts, np.asarray(times)[starts]
@@ -0,0 +1,228 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Results of expensive steps (decoding, analysis, figures, metrics) keyed by a
+# hash of the input bytes plus the parameters, so Streamlit reruns on the same
+# upload reuse them. Entries live in an in-memory LRU bounded by both count
+# and the bytes of the arrays they hold; with a cache directory they are also
+# pickled to disk and survive restarts, evicting the least recently used files
+# once the directory grows past its size limit. The directory must only be
+# writable by this app, since entries are unpickled.
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+DEFAULT_DISK_LIMIT = 512 * 1024 * 1024
+# Spectral analyses hold several full spectrograms each, so only the most
+# recent ones are kept, in a cache of their own
+ANALYSIS_CACHE_ENTRIES = 2
+
+def content_key(namespace, *parts):
+    """Hash bytes-like parts and parameter values into a cache key"""
+    digest = hashlib.blake2b(namespace.encode(), digest_size=20)
+    for part in parts:
+        if isinstance(part, (bytes, bytearray, memoryview)):
+            digest.update(b'b%d:' % len(part))
+            digest.update(part)
+        else:
+            text = repr(part).encode()
+            digest.update(b'r%d:' % len(text))
+            digest.update(text)
+    return f"{namespace}-{digest.hexdigest()}"
+
+def value_nbytes(value):
+    """
+    Approximate memory held by a cached value: the nbytes of arrays (or of
+    objects that report it) and the length of byte strings, summed through
+    tuples, lists and dicts. Other objects count as zero.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(item) for item in value.values())
+    nbytes = getattr(value, 'nbytes', 0)
+    return nbytes if isinstance(nbytes, int) else 0
+
+class ResultCache:
+    """Two-tier LRU cache: a count- and byte-bounded dict in memory and an optional size-bounded directory"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None, disk_limit=DEFAULT_DISK_LIMIT,
+                 max_bytes=DEFAULT_MEMORY_LIMIT):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_limit = disk_limit
+        self._memory = OrderedDict()
+        self._sizes = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + '.pkl')
+
+    def _measure(self, key):
+        # Called with the lock held. Values such as analyses grow as their
+        # lazy parts are computed, so sizes are refreshed on every access.
+        size = value_nbytes(self._memory[key])
+        self._memory_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def _evict_memory(self):
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            key, _ = self._memory.popitem(last=False)
+            self._memory_bytes -= self._sizes.pop(key)
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            self._measure(key)
+            self._evict_memory()
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated, corrupt or stale entries (e.g. pickled by an older
+            # version of a class) are misses; remove them so they are rewritten
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Access time drives eviction; bump it explicitly since many mounts use noatime
+        os.utime(path)
+        return (value,)
+
+    def _write_disk(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # Unpicklable results simply stay memory-only
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.pkl'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+    def get_or_compute(self, key, compute, persist=True):
+        """
+        Return the cached value for key, calling compute() on a miss. With
+        persist=False the value is kept in memory only, for objects that are
+        large or cheap to rebuild from persisted results.
+        """
+        with self._lock:
+            if key in self._memory:
+                value = self._memory[key]
+                self._memory.move_to_end(key)
+                self._measure(key)
+                self._evict_memory()
+                self._hits += 1
+                return value
+
+        found = self._read_disk(key) if persist else None
+        if found is not None:
+            with self._lock:
+                self._disk_hits += 1
+            self._remember(key, found[0])
+            return found[0]
+
+        with self._lock:
+            self._misses += 1
+        value = compute()
+        self._remember(key, value)
+        if persist and self.disk_dir:
+            self._write_disk(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._sizes.clear()
+            self._memory_bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+            }
+
+_default_cache = None
+_analysis_cache = None
+_default_lock = threading.Lock()
+
+def _env_megabytes(name, default):
+    return int(os.environ.get(name, default // (1024 * 1024))) * 1024 * 1024
+
+def get_default_cache():
+    """
+    Return the process-wide cache. Setting SSV_CACHE_DIR enables the disk tier
+    and SSV_CACHE_DISK_MB bounds its size; SSV_CACHE_MEMORY_MB bounds the
+    memory tier.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache(disk_dir=os.environ.get('SSV_CACHE_DIR') or None,
+                                         disk_limit=_env_megabytes('SSV_CACHE_DISK_MB', DEFAULT_DISK_LIMIT),
+                                         max_bytes=_env_megabytes('SSV_CACHE_MEMORY_MB', DEFAULT_MEMORY_LIMIT))
+        return _default_cache
+
+def get_analysis_cache():
+    """
+    Return the process-wide memory-only cache for spectral analyses and the
+    feature sets that reference them. It is bounded by entry count alone:
+    feature sets pin their analysis without reporting its size, and a single
+    long clip's analysis may exceed the default cache's byte limit.
+    """
+    global _analysis_cache
+    with _default_lock:
+        if _analysis_cache is None:
+            _analysis_cache = ResultCache(max_entries=ANALYSIS_CACHE_ENTRIES, max_bytes=float('inf'))
+        return _analysis_cache
@@ -1,12 +1,25 @@
 import plotly.graph_objects as go
 import numpy as np
 import librosa
+from utils.audio_analysis import get_analysis
+from utils.downsample import DEFAULT_WIDTH, bin_matrix, bin_series, minmax_envelope
 
-def create_waveform_plot(y, sr):
+# Every spectral plot takes an optional AudioAnalysis so that several plots of
+# the same signal share one STFT. width is the target plot width in pixels;
+# traces are reduced to about that many points whatever the clip length.
+
+def _compact_db(S_db):
+    """
+    Round a dB matrix (limited to 80 dB below peak by librosa) to whole dB as
+    int8, which Plotly serializes at a quarter of the float32 size
+    """
+    return np.round(S_db).astype(np.int8)
+
+def create_waveform_plot(y, sr, width=DEFAULT_WIDTH):
     """Create interactive waveform plot"""
-    times = np.arange(len(y))/sr
+    times, values = minmax_envelope(y, sr, width)
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=times, y=y, name='Waveform'))
+    fig.add_trace(go.Scattergl(x=times, y=values, name='Waveform'))
     fig.update_layout(
         title="Audio Waveform",
         xaxis_title="Time (s)",
@@ -15,15 +28,16 @@ def create_waveform_plot(y, sr):
     )
     return fig
 
-def create_spectrogram_plot(y, sr):
+def create_spectrogram_plot(y, sr, analysis=None, width=DEFAULT_WIDTH):
     """Create interactive spectrogram plot"""
-    D = librosa.stft(y)
-    S_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
+    analysis = get_analysis(y, sr, analysis)
+    S_db = librosa.amplitude_to_db(analysis.magnitude, ref=np.max)
+    S_db, times, frequencies = bin_matrix(S_db, analysis.times, analysis.frequencies, width)
     
     fig = go.Figure(data=go.Heatmap(
-        z=S_db,
-        x=librosa.times_like(S_db),
-        y=librosa.fft_frequencies(sr=sr),
+        z=_compact_db(S_db),
+        x=times,
+        y=frequencies,
         colorscale='Viridis'
     ))
     
@@ -35,13 +49,13 @@ def create_spectrogram_plot(y, sr):
     )
     return fig
 
-def create_mel_spectrogram(y, sr):
+def create_mel_spectrogram(y, sr, analysis=None, width=DEFAULT_WIDTH):
     """Create Mel spectrogram plot"""
-    mel_spect = librosa.feature.melspectrogram(y=y, sr=sr)
-    mel_db = librosa.power_to_db(mel_spect, ref=np.max)
+    analysis = get_analysis(y, sr, analysis)
+    mel_db, _, _ = bin_matrix(librosa.power_to_db(analysis.mel, ref=np.max), width=width)
     
     fig = go.Figure(data=go.Heatmap(
-        z=mel_db,
+        z=_compact_db(mel_db),
         colorscale='Viridis'
     ))
     
@@ -53,13 +67,12 @@ def create_mel_spectrogram(y, sr):
     )
     return fig
 
-def create_spectral_features_plot(y, sr):
+def create_spectral_features_plot(y, sr, analysis=None, width=DEFAULT_WIDTH):
     """Create spectral features visualization"""
-    spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
-    spec_bw = librosa.feature.spectral_bandwidth(y=y, sr=sr)[0]
-    spec_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)[0]
-    
-    times = librosa.times_like(spec_cent)
+    analysis = get_analysis(y, sr, analysis)
+    spec_cent, times = bin_series(analysis.spectral_centroid, analysis.times, width)
+    spec_bw, _ = bin_series(analysis.spectral_bandwidth, analysis.times, width)
+    spec_rolloff, _ = bin_series(analysis.spectral_rolloff, analysis.times, width)
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=times, y=spec_cent, name='Spectral Centroid'))
@@ -74,11 +87,10 @@ def create_spectral_features_plot(y, sr):
     )
     return fig
 
-def create_energy_contour_plot(y, sr):
+def create_energy_contour_plot(y, sr, analysis=None, width=DEFAULT_WIDTH):
     """Create energy contour visualization"""
-    S = np.abs(librosa.stft(y))
-    energy = librosa.feature.rms(S=S)[0]
-    times = librosa.times_like(energy)
+    analysis = get_analysis(y, sr, analysis)
+    energy, times = bin_series(analysis.rms, analysis.times, width)
     
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=times, y=energy, fill='tozeroy', name='Energy'))
@@ -91,13 +103,14 @@ def create_energy_contour_plot(y, sr):
     )
     return fig
 
-def create_chroma_plot(y, sr):
+def create_chroma_plot(y, sr, analysis=None, width=DEFAULT_WIDTH):
     """Create chromagram visualization"""
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+    analysis = get_analysis(y, sr, analysis)
+    chroma, times, _ = bin_matrix(analysis.chroma, analysis.times, width=width)
     
     fig = go.Figure(data=go.Heatmap(
         z=chroma,
-        x=librosa.times_like(chroma),
+        x=times,
         y=['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'],
         colorscale='Viridis'
     ))